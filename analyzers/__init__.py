@@ -70,6 +70,18 @@ class BaseAnalyzer(metaclass=BaseAnalyzerMeta):
         """Perform the analysis of the asset"""
         raise NotImplementedError()
 
+    @classmethod
+    def preload(cls):
+        """
+        Import the dependencies the analyzer requires to run and load any data
+        it uses.
+
+        Analyzers import heavy dependencies (e.g OpenCV, scikit-learn) when
+        they're first run so that processes which only validate analyzers
+        (e.g the API) never load them. Processes that will run analyzers can
+        preload them instead (e.g before forking workers).
+        """
+
     def _add_to_meta(self, asset, data):
         """Add the specified data to the asset's meta"""
 
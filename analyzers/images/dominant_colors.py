@@ -2,9 +2,7 @@ import io
 import operator
 
 from manhattan.forms import BaseForm, fields, validators
-import numpy
 from PIL import Image
-from sklearn.cluster import MiniBatchKMeans
 
 from analyzers import BaseAnalyzer
 
@@ -70,6 +68,9 @@ class DominantColorsAnalyzer(BaseAnalyzer):
         self.max_sample_size = max_sample_size
 
     def analyze(self, config, asset, file, history):
+        import numpy
+        from sklearn.cluster import MiniBatchKMeans
+
         # Load the image
         image = Image.open(io.BytesIO(file))
 
@@ -128,3 +129,8 @@ class DominantColorsAnalyzer(BaseAnalyzer):
     @classmethod
     def get_settings_form_cls(cls):
         return SettingsForm
+
+    @classmethod
+    def preload(cls):
+        import numpy
+        import sklearn.cluster
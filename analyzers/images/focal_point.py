@@ -8,7 +8,8 @@ from analyzers import BaseAnalyzer
 from .utils import (
     convert_to_gray_cv,
     detect_faces,
-    detect_points_of_interest
+    detect_points_of_interest,
+    get_default_face_classifier
 )
 
 __all__ = ['FocalPointAnalyzer']
@@ -197,3 +198,7 @@ class FocalPointAnalyzer(BaseAnalyzer):
     @classmethod
     def get_settings_form_cls(cls):
         return SettingsForm
+
+    @classmethod
+    def preload(cls):
+        get_default_face_classifier()
@@ -2,26 +2,26 @@
 A set of utils for image transforms.
 """
 
+import functools
 import os
 
-import cv2
-import numpy
-
 __all__ = [
     'convert_to_gray_cv',
-    'detect_points_of_interest'
+    'detect_points_of_interest',
+    'get_default_face_classifier'
 ]
 
+# NOTE: OpenCV and numpy are imported when first used so that processes which
+# only import analyzers to validate them (e.g the API) don't load them.
+
 
 # CONSTANTS
 
-DEFAULT_FACE_CLASSIFIER = cv2.CascadeClassifier(
-    os.path.join(
-        os.path.dirname(__file__),
-        'data/cascades',
-        'haarcascade_frontalface_alt2'
-    ) + '.xml'
-)
+DEFAULT_FACE_CLASSIFIER_PATH = os.path.join(
+    os.path.dirname(__file__),
+    'data/cascades',
+    'haarcascade_frontalface_alt2'
+) + '.xml'
 
 
 def convert_to_gray_cv(image):
@@ -29,6 +29,8 @@ def convert_to_gray_cv(image):
     Take the given PIL image and return a grayscale CV image (suitable for
     feature detection.)
     """
+    import cv2
+    import numpy
 
     image = image.copy()
     if image.mode != 'RGB':
@@ -38,8 +40,10 @@ def convert_to_gray_cv(image):
 
 def detect_faces(image, classifier=None, cv_args=None):
     """Return a list of faces detected within the given image"""
+    import cv2
+
     equ_image = cv2.equalizeHist(image)
-    faces = (classifier or DEFAULT_FACE_CLASSIFIER).detectMultiScale(
+    faces = (classifier or get_default_face_classifier()).detectMultiScale(
         equ_image,
         **{
             'scaleFactor': 1.05,
@@ -58,6 +62,9 @@ def detect_faces(image, classifier=None, cv_args=None):
 
 def detect_points_of_interest(image, cv_args=None):
     """Return a list of points of interest detected within the given image"""
+    import cv2
+    import numpy
+
     points = cv2.goodFeaturesToTrack(
         image,
         mask=None,
@@ -75,3 +82,10 @@ def detect_points_of_interest(image, cv_args=None):
         return []
 
     return numpy.reshape(points, (-1, 2)).tolist()
+
+@functools.lru_cache()
+def get_default_face_classifier():
+    """Return the default face classifier (loaded on first use)"""
+    import cv2
+
+    return cv2.CascadeClassifier(DEFAULT_FACE_CLASSIFIER_PATH)
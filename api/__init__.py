@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import json
 import time
 import uuid
@@ -8,6 +9,9 @@ from mongoframes import Q
 import swm
 import tornado.web
 
+import metrics
+from workers.counters import get_tasks_key
+
 __all__ = [
     'APIError',
     'APIHandler',
@@ -87,6 +91,42 @@ class APIHandler(swm.servers.RequestHandler):
         # Prevent automatic setting of etag and 304 responses
         return None
 
+    async def add_task_and_wait(self, task):
+        await self.count_task(task)
+        with self.phase('task_wait'):
+            return await super().add_task_and_wait(task)
+
+    async def add_task_and_forget(self, task):
+        await self.count_task(task)
+        with self.phase('task_wait'):
+            return await super().add_task_and_forget(task)
+
+    async def count_task(self, task):
+        """
+        Record a task in the task counters (see `workers.counters`), this
+        must be called before the task is added.
+        """
+        await self.redis.zadd(
+            get_tasks_key(type(task)),
+            task.timestamp / 10 ** 9,
+            task.id
+        )
+
+    def finish(self, chunk=None):
+
+        if self.config.get('API_SERVER_TIMING') and not self._headers_written:
+
+            # Report the time spent in each phase of handling the request
+            self.set_header(
+                'Server-Timing',
+                ', '.join(
+                    f'{name};dur={duration * 1000:.3f}'
+                    for name, duration in self._phase_times.items()
+                )
+            )
+
+        return super().finish(chunk)
+
     def initialize(self):
 
         # The account associated with the caller
@@ -98,7 +138,24 @@ class APIHandler(swm.servers.RequestHandler):
         # A timer used to time taken for the call
         self._call_timer = time.time()
 
+        # A table of the time spent in each phase of handling the request
+        self._phase_times = {}
+
     def on_finish(self):
+
+        # Record the request's metrics
+        handler = type(self).__name__
+        metrics.API_REQUESTS.inc(
+            handler=handler,
+            method=self.request.method,
+            status=self._status_code
+        )
+        metrics.API_REQUEST_SECONDS.observe(
+            time.time() - self._call_timer,
+            handler=handler,
+            method=self.request.method
+        )
+
         # Build the log entry
 
         # If there's no associated account we don't log the request
@@ -150,6 +207,9 @@ class APIHandler(swm.servers.RequestHandler):
         # (Re)Set the call timer
         self._call_timer = time.time()
 
+        # (Re)Set the phase times
+        self._phase_times = {}
+
         # Check a valid API key has been provided
         api_key = self.request.headers.get('X-H51-APIKey')
 
@@ -157,13 +217,14 @@ class APIHandler(swm.servers.RequestHandler):
             raise APIError('unauthorized', 'No authorization key provided.')
 
         # Find the calling account
-        account = Account.one(
-            Q.api_key == api_key,
-            projection={
-                'api_allowed_ip_addresses': True,
-                'api_rate_limit_per_second': True
-            }
-        )
+        with self.phase('auth'):
+            account = Account.one(
+                Q.api_key == api_key,
+                projection={
+                    'api_allowed_ip_addresses': True,
+                    'api_rate_limit_per_second': True
+                }
+            )
 
         # Store a reference to the account document against the request handler
         self._account = account
@@ -185,20 +246,22 @@ class APIHandler(swm.servers.RequestHandler):
                 )
 
         # Record this request
-        rate_key = account.get_rate_key()
-        ttl = await self.redis.pttl(rate_key)
+        with self.phase('rate_limit'):
+            rate_key = account.get_rate_key()
+            ttl = await self.redis.pttl(rate_key)
+
+            if ttl > 0:
+                await self.redis.incr(rate_key)
 
-        if ttl > 0:
-            await self.redis.incr(rate_key)
+            else:
+                multi = self.redis.multi_exec()
+                multi.incr(rate_key)
+                multi.expire(rate_key, 1)
+                await multi.execute()
 
-        else:
-            multi = self.redis.multi_exec()
-            multi.incr(rate_key)
-            multi.expire(rate_key, 1)
-            await multi.execute()
+            request_count = int((await self.redis.get(rate_key)) or 0)
 
         # Apply rate limit
-        request_count = int((await self.redis.get(rate_key)) or 0)
         rate_limit = account.api_rate_limit_per_second \
                 or self.config['API_RATE_LIMIT_PER_SECOND']
 
@@ -218,11 +281,30 @@ class APIHandler(swm.servers.RequestHandler):
         self.set_header('X-H51-RateLimit-Reset', str(rate_key_reset))
 
         # Update the API call stats
-        Stats.inc(
-            account,
-            today_tz(tz=self.config['TIMEZONE']),
-            {'api_calls': 1}
-        )
+        with self.phase('db'):
+            Stats.inc(
+                account,
+                today_tz(tz=self.config['TIMEZONE']),
+                {'api_calls': 1}
+            )
+
+    @contextlib.contextmanager
+    def phase(self, name):
+        """
+        Time a phase of handling the request (e.g `db`, `backend`), the time
+        spent in each phase is accumulated for the request and can be
+        reported in the response's `Server-Timing` header (see the
+        `API_SERVER_TIMING` setting).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+
+        finally:
+            duration = time.perf_counter() - started
+            self._phase_times[name] = self._phase_times.get(name, 0) \
+                    + duration
+            metrics.API_PHASE_SECONDS.observe(duration, phase=name)
 
     def write(self, chunk):
         super().write(chunk)
@@ -268,6 +350,7 @@ class APIHandler(swm.servers.RequestHandler):
 class APIErrorHandler(APIHandler):
 
     def initialize(self, status_code):
+        super().initialize()
         self.set_status(status_code)
 
     def prepare(self):
@@ -281,3 +364,4 @@ class APIErrorHandler(APIHandler):
 # API handlers should be imported here
 
 from . import assets
+from . import monitor
@@ -2,10 +2,10 @@ import asyncio
 import json
 
 from pymongo import ReadPreference
-from werkzeug.datastructures import MultiDict
 
 from analyzers import get_analyzer
 from api import APIError, APIHandler
+from api.utils import validate_settings
 from blueprints.assets.models import Asset
 from workers.tasks import AnalyzeTask
 
@@ -63,20 +63,18 @@ class BaseAnalyzeHandler:
                 )
 
             # Check the settings for the analyzer are correct
-            settings_form = analyzer_cls.get_settings_form_cls()(
-                MultiDict({
-                    k: v for k, v in analyzer[1].items()
-                        if v is not None
-                })
+            errors, _ = validate_settings(
+                analyzer_cls.get_settings_form_cls(),
+                analyzer[1]
             )
-            if not settings_form.validate():
+            if errors:
                 raise APIError(
                     'invalid_request',
                     hint=(
                         'Invalid settings for analyzer: '
                         f'{asset_type}:{analyzer[0]}.'
                     ),
-                    arg_errors=settings_form.errors
+                    arg_errors=errors
                 )
 
         return analyzers
@@ -199,10 +197,22 @@ class AnalyzeManyHandler(BaseCollectionHandler, BaseAnalyzeHandler):
                     hint='Each uid must be assigned a list of analyzers.'
                 )
 
-            analyzers = {
-                a.uid: self.validate_analyzers(a.type, raw_analyzers[a.uid])
-                for a in assets
-            }
+            # Assets commonly share the same analyzers so each distinct
+            # (canonical) set of analyzers is only validated once.
+            validated = {}
+            analyzers = {}
+            for a in assets:
+                key = (
+                    a.type,
+                    json.dumps(raw_analyzers[a.uid], sort_keys=True)
+                )
+                if key not in validated:
+                    validated[key] = self.validate_analyzers(
+                        a.type,
+                        raw_analyzers[a.uid]
+                    )
+
+                analyzers[a.uid] = validated[key]
 
         else:
             # Global application
@@ -227,6 +237,17 @@ class AnalyzeManyHandler(BaseCollectionHandler, BaseAnalyzeHandler):
         # Add a set of tasks to generate the asset variations
         notification_url = self.get_body_argument('notification_url', None)
 
+        # If a notification URL is given the tasks are added as a job so that
+        # a single notification is sent when all the tasks are complete.
+        job_id = None
+        if notification_url:
+            job_id = await self.add_job(
+                'analyze',
+                assets,
+                len(assets),
+                notification_url
+            )
+
         tasks = []
         task_names = []
 
@@ -236,7 +257,7 @@ class AnalyzeManyHandler(BaseCollectionHandler, BaseAnalyzeHandler):
                 self.account._id,
                 asset._id,
                 analyzers[asset.uid],
-                notification_url
+                job_id=job_id
             )
 
             if notification_url:
@@ -249,8 +270,8 @@ class AnalyzeManyHandler(BaseCollectionHandler, BaseAnalyzeHandler):
         if notification_url:
 
             # Fire and forget
-            await self.add_task_and_forget(task)
-            self.finish()
+            await asyncio.gather(*tasks)
+            self.write({'job_id': job_id})
 
         else:
 
@@ -1,10 +1,12 @@
 import asyncio
 import imghdr
 import io
+import json
 import mimetypes
 import os
 import re
 import time
+import uuid
 
 import clamd
 from manhattan.formatters.text import remove_accents
@@ -19,6 +21,7 @@ from api import APIError, APIHandler
 from api.utils import PaginationForm, paginate, to_multi_dict
 from blueprints.accounts.models import Account, Stats
 from blueprints.assets.models import Asset, Variation
+from workers.jobs import get_job_key
 
 __all__ = ['CollectionHandler']
 
@@ -91,6 +94,34 @@ class BaseCollectionHandler(APIHandler):
         }
     }
 
+    async def add_job(self, job_type, assets, task_count, notification_url):
+        """
+        Add a job to track the tasks for a bulk request, when all of the job's
+        tasks are complete a single notification is sent to the notification
+        URL. The Id of the job is returned and must be assigned to each task.
+
+        The job must be added before any of its tasks.
+        """
+
+        job_id = uuid.uuid4().hex
+        job_key = get_job_key(job_id)
+
+        multi = self.redis.multi_exec()
+        multi.hmset_dict(
+            job_key,
+            {
+                'account_id': str(self.account._id),
+                'type': job_type,
+                'notification_url': notification_url,
+                'asset_ids': json.dumps([str(a._id) for a in assets]),
+                'outstanding': task_count
+            }
+        )
+        multi.expire(job_key, self.config['BULK_JOB_LIFESPAN'])
+        await multi.execute()
+
+        return job_id
+
     def get_assets(self, projection=None):
         """
         Return a list of assets given (as JSON) in the form argument `assets`.
@@ -104,14 +135,15 @@ class BaseCollectionHandler(APIHandler):
             )
 
         # Fetch the asset
-        return Asset.many(
-            And(
-                Q.account == self.account,
-                In(Q.uid, uids),
-                Not(Q.expires <= time.time())
-            ),
-            projection=(projection or self.DEFAULT_PROJECTION)
-        )
+        with self.phase('db'):
+            return Asset.many(
+                And(
+                    Q.account == self.account,
+                    In(Q.uid, uids),
+                    Not(Q.expires <= time.time())
+                ),
+                projection=(projection or self.DEFAULT_PROJECTION)
+            )
 
     def get_backend(self, secure=False):
         """
@@ -121,10 +153,11 @@ class BaseCollectionHandler(APIHandler):
 
         backend_type = 'secure' if secure else 'public'
 
-        account = Account.by_id(
-            self.account._id,
-            projection={f'{backend_type}_backend_settings': True}
-        )
+        with self.phase('db'):
+            account = Account.by_id(
+                self.account._id,
+                projection={f'{backend_type}_backend_settings': True}
+            )
 
         backend = getattr(account, f'{backend_type}_backend', None)
 
@@ -168,23 +201,24 @@ class CollectionHandler(BaseCollectionHandler):
             query_stack.append(Q.type == form_data['type'])
 
         # Get the paginated results
-        response = paginate(
-            Asset,
-            query_stack,
-            self.request,
-            before=form_data['before'],
-            after=form_data['after'],
-            limit=form_data['limit'],
-            projection={
-                'created': True,
-                'modified': True,
-                'name': True,
-                'secure': True,
-                'type': True,
-                'uid': True,
-                'ext': True
-            }
-        )
+        with self.phase('db'):
+            response = paginate(
+                Asset,
+                query_stack,
+                self.request,
+                before=form_data['before'],
+                after=form_data['after'],
+                limit=form_data['limit'],
+                projection={
+                    'created': True,
+                    'modified': True,
+                    'name': True,
+                    'secure': True,
+                    'type': True,
+                    'uid': True,
+                    'ext': True
+                }
+            )
 
         self.write(response)
 
@@ -318,23 +352,26 @@ class CollectionHandler(BaseCollectionHandler):
         # Store the file
         backend = self.get_backend(asset.secure)
 
-        await backend.async_store(
-            io.BytesIO(file.body),
-            asset.store_key,
-            loop=asyncio.get_event_loop()
-        )
+        with self.phase('backend'):
+            await backend.async_store(
+                io.BytesIO(file.body),
+                asset.store_key,
+                loop=asyncio.get_event_loop()
+            )
 
-        # Save the asset
-        asset.insert()
+        with self.phase('db'):
 
-        # Update the asset stats
-        Stats.inc(
-            self.account,
-            today_tz(tz=self.config['TIMEZONE']),
-            {
-                'assets': 1,
-                'length': asset.meta['length']
-            }
-        )
+            # Save the asset
+            asset.insert()
+
+            # Update the asset stats
+            Stats.inc(
+                self.account,
+                today_tz(tz=self.config['TIMEZONE']),
+                {
+                    'assets': 1,
+                    'length': asset.meta['length']
+                }
+            )
 
         self.write(asset.to_json_type())
@@ -1,8 +1,14 @@
+import asyncio
+import os
+from urllib.parse import quote
+
 from mongoframes import And, Q
 
 from api import APIError, APIHandler
+from api.utils import parse_range
 from blueprints.accounts.models import Account
 from blueprints.assets.models import Asset, Variation
+import metrics
 
 from .collection import BaseCollectionHandler
 
@@ -27,13 +33,14 @@ class BaseDocumentHandler(BaseCollectionHandler):
                 '`expires` must be included by the projection'
 
         # Fetch the asset
-        asset = Asset.one(
-            And(
-                Q.account == self.account,
-                Q.uid == uid
-            ),
-            projection=(projection or self.DEFAULT_PROJECTION)
-        )
+        with self.phase('db'):
+            asset = Asset.one(
+                And(
+                    Q.account == self.account,
+                    Q.uid == uid
+                ),
+                projection=(projection or self.DEFAULT_PROJECTION)
+            )
         if not asset or asset.expired:
             raise APIError(
                 'not_found',
@@ -42,6 +49,13 @@ class BaseDocumentHandler(BaseCollectionHandler):
 
         return asset
 
+    def get_cache_key(self, store_key):
+        """
+        Return the key a file is cached against in the application's caches
+        (store keys are only unique per account).
+        """
+        return f'{self.account._id}:{store_key}'
+
     def get_variation(self, asset, name):
         """
         Return the named variation from the asset and raise an error if the
@@ -57,6 +71,155 @@ class BaseDocumentHandler(BaseCollectionHandler):
 
         return variation
 
+    async def send_file(self, asset, store_key, content_type, cacheable=True):
+        """
+        Send a file for the asset as the response.
+
+        Files stored on the local file system (see
+        `BaseBackend.get_local_path`) are either streamed from disk in chunks
+        (supporting range requests), or if `DOWNLOAD_ACCEL_REDIRECT_PREFIX`
+        is set (and the file is within `DOWNLOAD_ACCEL_REDIRECT_ROOT`),
+        handed off to nginx to serve using `X-Accel-Redirect`.
+
+        Other files are retrieved from the backend, files for public assets
+        are read through the application's download cache (if there is one).
+        Only files stored against keys that are never reused for different
+        content should be flagged as `cacheable`.
+        """
+
+        loop = asyncio.get_event_loop()
+
+        self.set_header(
+            'Content-Type',
+            content_type or 'application/octet-stream'
+        )
+
+        download_cache = None
+        if cacheable and not asset.secure:
+            download_cache = self.application.download_cache
+            cache_key = self.get_cache_key(store_key)
+
+        if download_cache:
+            with self.phase('cache'):
+                file = await download_cache.async_get(cache_key, loop)
+
+            metrics.CACHE_REQUESTS.inc(
+                cache='download',
+                result='miss' if file is None else 'hit'
+            )
+
+            if file is not None:
+                self.write(file)
+                return
+
+        backend = self.get_backend(asset.secure)
+
+        # Send local files without reading them into memory
+        path = backend.get_local_path(store_key)
+        if path:
+            accel_redirect_path = self._get_accel_redirect_path(path)
+
+            if accel_redirect_path:
+                self.set_header('X-Accel-Redirect', accel_redirect_path)
+
+            else:
+                with self.phase('backend'):
+                    await self._stream_file(path, backend.get_executor())
+
+            return
+
+        with self.phase('backend'):
+            file = await backend.async_retrieve(store_key, loop=loop)
+
+        if download_cache:
+            with self.phase('cache'):
+                await download_cache.async_set(
+                    cache_key,
+                    file,
+                    loop,
+                    expires=asset.expires
+                )
+
+        self.write(file)
+
+    def _get_accel_redirect_path(self, path):
+        """
+        Return the path nginx should serve a local file from (see
+        `DOWNLOAD_ACCEL_REDIRECT_PREFIX`), or `None` if the file can't be
+        served by nginx.
+        """
+
+        prefix = self.config.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX')
+        root = self.config.get('DOWNLOAD_ACCEL_REDIRECT_ROOT')
+
+        if not (prefix and root):
+            return None
+
+        # Only files within the root directory (the directory nginx's
+        # internal location is aliased to) can be served.
+        root = os.path.abspath(root)
+        path = os.path.abspath(path)
+        if os.path.commonpath((root, path)) != root:
+            return None
+
+        return prefix.rstrip('/') + '/' + quote(os.path.relpath(path, root))
+
+    async def _stream_file(self, path, executor=None):
+        """
+        Stream a file (or the requested range of it) from disk, blocking file
+        I/O is performed using the given executor.
+        """
+
+        loop = asyncio.get_event_loop()
+        chunk_size = self.config['DOWNLOAD_CHUNK_SIZE']
+
+        f = await loop.run_in_executor(executor, open, path, 'rb')
+        with f:
+
+            length = os.fstat(f.fileno()).st_size
+            start, end = 0, length
+
+            self.set_header('Accept-Ranges', 'bytes')
+
+            range_header = self.request.headers.get('Range')
+            if range_header:
+                try:
+                    request_range = parse_range(range_header, length)
+
+                except ValueError:
+                    self.set_status(416)
+                    self.set_header('Content-Range', f'bytes */{length}')
+                    self.clear_header('Content-Type')
+                    return
+
+                if request_range:
+                    start, end = request_range
+                    self.set_status(206)
+                    self.set_header(
+                        'Content-Range',
+                        f'bytes {start}-{end - 1}/{length}'
+                    )
+
+            self.set_header('Content-Length', end - start)
+
+            f.seek(start)
+            remaining = end - start
+
+            while remaining > 0:
+                chunk = await loop.run_in_executor(
+                    executor,
+                    f.read,
+                    min(chunk_size, remaining)
+                )
+
+                if not chunk:
+                    break
+
+                remaining -= len(chunk)
+
+                self.write(chunk)
+                await self.flush()
+
 
 class DocumentHandler(BaseDocumentHandler):
 
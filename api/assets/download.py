@@ -1,4 +1,3 @@
-import asyncio
 from mongoframes import And, Q
 
 from api import APIError, APIHandler
@@ -27,15 +26,4 @@ class DownloadHandler(BaseDocumentHandler):
         )
 
         # Downlad the file
-        backend = self.get_backend(asset.secure)
-
-        file = await backend.async_retrieve(
-            asset.store_key,
-            loop=asyncio.get_event_loop()
-        )
-
-        self.set_header(
-            'Content-Type',
-            asset.content_type or 'application/octet-stream'
-        )
-        self.write(file)
+        await self.send_file(asset, asset.store_key, asset.content_type)
@@ -1,3 +1,4 @@
 from .collection import *
 from .document import *
 from .download import *
+from .render import *
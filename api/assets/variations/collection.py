@@ -4,11 +4,12 @@ import re
 
 from pymongo import ReadPreference
 from slugify.slugify import slugify
-from werkzeug.datastructures import MultiDict
 
 from api import APIError, APIHandler
 from api.assets.document import BaseCollectionHandler, BaseDocumentHandler
+from api.utils import validate_settings
 from blueprints.assets.models import Asset, Variation
+from workers.counters import get_tasks_key
 from workers.tasks import GenerateVariationTask
 from transforms import get_transform
 
@@ -22,11 +23,119 @@ __all__ = [
 
 ALLOWED_SLUGIFY_CHARACTERS = re.compile(r'[^-_a-z0-9]+')
 
+# A script that claims the flight for a task and (if claimed) counts and adds
+# the task. Claiming and adding the task atomically ensures a claimed flight
+# always refers to a task that exists (until the task is complete).
+#
+# KEYS: flight key, task id, tasks (counter) key
+# ARGV: task id, flight lifespan, task JSON, task timestamp (in seconds)
+CLAIM_FLIGHT_SCRIPT = '''
+if redis.call('set', KEYS[1], ARGV[1], 'NX', 'EX', ARGV[2]) then
+    redis.call('zadd', KEYS[3], ARGV[4], ARGV[1])
+    redis.call('set', KEYS[2], ARGV[3])
+    return 1
+end
+return 0
+'''
+
+# A script that releases the flight for a task if the task no longer exists
+# (e.g the task was cleared, or the worker performing it failed before
+# releasing the flight).
+#
+# KEYS: flight key, task id
+# ARGV: task id
+RELEASE_STALE_FLIGHT_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1]
+        and redis.call('exists', KEYS[2]) == 0 then
+    redis.call('del', KEYS[1])
+    return 1
+end
+return 0
+'''
+
 
 # Handlers
 
 class BaseVariationsHandler:
 
+    # A table of the waits for variation tasks within this process
+    # `{task_id: asyncio.Future}`. A task's event can only be collected once
+    # per process, so all handlers waiting on the same task share one wait.
+    _task_waits = {}
+
+    async def add_variation_task_and_wait(self, task):
+        """
+        Add a task to generate a variation and wait for an event. If an
+        identical task (see `GenerateVariationTask.flight_key`) is already in
+        flight then wait for that task's event instead of adding the task
+        (unless the task no longer exists, in which case the flight is
+        released and claimed again).
+        """
+
+        with self.phase('task_wait'):
+
+            task_id = None
+            while not task_id:
+
+                # Claim the flight for the task
+                claimed = await self.redis.eval(
+                    CLAIM_FLIGHT_SCRIPT,
+                    keys=[
+                        task.flight_key,
+                        task.id,
+                        get_tasks_key(type(task))
+                    ],
+                    args=[
+                        task.id,
+                        self.config['VARIATION_TASK_FLIGHT_LIFESPAN'],
+                        json.dumps(task.to_json_type()),
+                        task.timestamp / 10 ** 9
+                    ]
+                )
+
+                if claimed:
+                    task_id = task.id
+                    continue
+
+                # Attach to the task in flight (if the task completed since
+                # we attempted to claim the flight then try again).
+                task_id = await self.redis.get(task.flight_key)
+                if not task_id:
+                    continue
+
+                task_id = task_id.decode('utf8')
+
+                # If the task in flight no longer exists then release the
+                # flight and try again.
+                released = await self.redis.eval(
+                    RELEASE_STALE_FLIGHT_SCRIPT,
+                    keys=[task.flight_key, task_id],
+                    args=[task_id]
+                )
+                if released:
+                    task_id = None
+
+            wait = self._task_waits.get(task_id)
+            if not wait:
+                wait = asyncio.ensure_future(self._wait_for_event(task_id))
+                wait.add_done_callback(
+                    lambda f: self._task_waits.pop(task_id, None)
+                )
+                self._task_waits[task_id] = wait
+
+            event = await asyncio.shield(wait)
+
+        if self.request.connection.stream.closed():
+            return
+
+        if not event:
+            raise APIError(
+                'error',
+                hint='Timed out waiting for the variation to be generated.'
+            )
+
+        return event
+
     def validate_variations(self, asset_type, variations):
         """
         Validate and the given map of variations (if valid the variations are
@@ -129,24 +238,50 @@ class BaseVariationsHandler:
                     )
 
                 # Check the settings for the transform are correct
-                settings_form = transform_cls.get_settings_form_cls()(
-                    MultiDict({
-                        k: v for k, v in transform[1].items()
-                        if v is not None
-                    })
+                errors, _ = validate_settings(
+                    transform_cls.get_settings_form_cls(),
+                    transform[1]
                 )
-                if not settings_form.validate():
+                if errors:
                     raise APIError(
                         'invalid_request',
                         hint=(
                             'Invalid settings for transform: '
                             f'{asset_type}:{transform[0]} ({name}).'
                         ),
-                        arg_errors=settings_form.errors
+                        arg_errors=errors
                     )
 
         return variations
 
+    async def _wait_for_event(self, task_id):
+        """
+        Wait for an event for the given task, returns `None` if no event is
+        received within the wait timeout (see `VARIATION_TASK_WAIT_TIMEOUT`).
+        """
+
+        loop = asyncio.get_event_loop()
+        deadline = loop.time() + self.config['VARIATION_TASK_WAIT_TIMEOUT']
+
+        event = self.task_event_listener.get_event(task_id)
+        while not event:
+
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                return
+
+            try:
+                await asyncio.wait_for(
+                    self.task_event_listener.wait(),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                return
+
+            event = self.task_event_listener.get_event(task_id)
+
+        return event
+
 
 class CollectionHandler(BaseDocumentHandler, BaseVariationsHandler):
 
@@ -191,7 +326,7 @@ class CollectionHandler(BaseDocumentHandler, BaseVariationsHandler):
             if notification_url:
                 tasks.append(self.add_task_and_forget(task))
             else:
-                tasks.append(self.add_task_and_wait(task))
+                tasks.append(self.add_variation_task_and_wait(task))
 
             task_names.append(variation_name)
 
@@ -288,10 +423,22 @@ class TransformManyHandler(BaseCollectionHandler, BaseVariationsHandler):
                     hint='Each uid must be assigned a variation.'
                 )
 
-            variations = {
-                a.uid: self.validate_variations(a.type, raw_variations[a.uid])
-                for a in assets
-            }
+            # Assets commonly share the same variations so each distinct
+            # (canonical) set of variations is only validated once.
+            validated = {}
+            variations = {}
+            for a in assets:
+                key = (
+                    a.type,
+                    json.dumps(raw_variations[a.uid], sort_keys=True)
+                )
+                if key not in validated:
+                    validated[key] = self.validate_variations(
+                        a.type,
+                        raw_variations[a.uid]
+                    )
+
+                variations[a.uid] = validated[key]
 
         else:
             # Global application
@@ -313,6 +460,17 @@ class TransformManyHandler(BaseCollectionHandler, BaseVariationsHandler):
         # Add a set of tasks to generate the asset variations
         notification_url = self.get_body_argument('notification_url', None)
 
+        # If a notification URL is given the tasks are added as a job so that
+        # a single notification is sent when all the tasks are complete.
+        job_id = None
+        if notification_url:
+            job_id = await self.add_job(
+                'transform',
+                assets,
+                sum(len(variations[a.uid]) for a in assets),
+                notification_url
+            )
+
         tasks = []
         task_names = []
 
@@ -326,13 +484,13 @@ class TransformManyHandler(BaseCollectionHandler, BaseVariationsHandler):
                     asset._id,
                     variation_name,
                     transforms,
-                    notification_url
+                    job_id=job_id
                 )
 
                 if notification_url:
                     tasks.append(self.add_task_and_forget(task))
                 else:
-                    tasks.append(self.add_task_and_wait(task))
+                    tasks.append(self.add_variation_task_and_wait(task))
 
                 task_names.append(f'{asset.uid}:{variation_name}')
 
@@ -340,7 +498,7 @@ class TransformManyHandler(BaseCollectionHandler, BaseVariationsHandler):
 
             # Fire and forget
             await asyncio.gather(*tasks)
-            self.finish()
+            self.write({'job_id': job_id})
 
         else:
 
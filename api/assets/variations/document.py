@@ -30,32 +30,43 @@ class DocumentHandler(BaseDocumentHandler):
         variation = self.get_variation(asset, variation_name)
 
         # Remove file for the variation
+        store_key = variation.get_store_key(asset, variation_name)
         backend = self.get_backend(asset.secure)
 
-        await backend.async_delete(
-            variation.get_store_key(asset, variation_name),
-            loop=asyncio.get_event_loop()
-        )
+        with self.phase('backend'):
+            await backend.async_delete(
+                store_key,
+                loop=asyncio.get_event_loop()
+            )
+
+        if self.application.download_cache:
+            with self.phase('cache'):
+                await self.application.download_cache.async_delete(
+                    self.get_cache_key(store_key),
+                    asyncio.get_event_loop()
+                )
 
-        # Remove the variation from the asset
-        Asset.get_collection().update(
-            (Q._id == asset._id).to_dict(),
-            {
-                '$unset': {
-                    f'variations.{variation_name}': ''
+        with self.phase('db'):
+
+            # Remove the variation from the asset
+            Asset.get_collection().update(
+                (Q._id == asset._id).to_dict(),
+                {
+                    '$unset': {
+                        f'variations.{variation_name}': ''
+                    }
                 }
-            }
-        )
+            )
 
-        # Update the asset stats
-        Stats.inc(
-            self.account,
-            today_tz(tz=self.config['TIMEZONE']),
-            {
-                'variations': -1,
-                'length': -variation.meta['length']
-            }
-        )
+            # Update the asset stats
+            Stats.inc(
+                self.account,
+                today_tz(tz=self.config['TIMEZONE']),
+                {
+                    'variations': -1,
+                    'length': -variation.meta['length']
+                }
+            )
 
         self.set_status(204)
         self.finish()
@@ -1,4 +1,3 @@
-import asyncio
 from mongoframes import And, Q
 
 from api import APIError, APIHandler
@@ -32,16 +31,11 @@ class DownloadHandler(BaseDocumentHandler):
 
         variation = self.get_variation(asset, variation_name)
 
-        # Downlad the file
-        backend = self.get_backend(asset.secure)
-
-        file = await backend.async_retrieve(
+        # Downlad the file (versionless variations are not cached as their
+        # store key is reused when the variation is regenerated).
+        await self.send_file(
+            asset,
             variation.get_store_key(asset, variation_name),
-            loop=asyncio.get_event_loop()
-        )
-
-        self.set_header(
-            'Content-Type',
-            variation.content_type or 'application/octet-stream'
+            variation.content_type,
+            cacheable=bool(variation.version)
         )
-        self.write(file)
@@ -0,0 +1,262 @@
+import asyncio
+import hashlib
+from urllib.parse import quote
+
+from pymongo import ReadPreference
+
+from api import APIError
+from api.assets.document import BaseDocumentHandler
+from api.utils import validate_settings
+from blueprints.assets.models import Asset, Variation
+import metrics
+from transforms import get_transform
+from workers.tasks import GenerateVariationTask
+
+from .collection import BaseVariationsHandler
+
+__all__ = ['RenderHandler']
+
+
+class RenderHandler(BaseDocumentHandler, BaseVariationsHandler):
+    """
+    Render a variation of an asset on request.
+
+    The transforms to apply are given as a spec in the URL, for example:
+
+        /assets/{uid}/render/fit:height=200,width=200;output:image_format=JPEG
+
+    Each spec is stored as a versionless variation (the final transform is
+    always applied with `versioned` set to `False`) named after a hash of the
+    spec's canonical form, so the variation is only generated the first time
+    it's requested. Requests for a spec that isn't in canonical form
+    (settings sorted by name) are redirected to the canonical URL.
+
+    The number of rendered variations stored against an asset is limited
+    (see the `RENDER_MAX_VARIATIONS` setting), once the limit is reached
+    requests for new specs are rejected.
+    """
+
+    async def get(self, uid, spec):
+        """Download a variation of an asset rendered from a spec"""
+
+        asset = self.get_asset(
+            uid,
+            projection={
+                '_id': True,
+                'expires': True,
+                'type': True
+            }
+        )
+
+        transforms = self.parse_spec(asset.type, spec)
+        canonical_spec = self.get_canonical_spec(transforms)
+
+        if spec != canonical_spec:
+            self.redirect(
+                f'/assets/{uid}/render/{quote(canonical_spec, safe=":;,=")}',
+                permanent=True
+            )
+            return
+
+        variation_name = 'render_' \
+                + hashlib.sha1(canonical_spec.encode('utf8')).hexdigest()[:20]
+
+        projection = {
+            'expires': True,
+            'name': True,
+            'secure': True,
+            'type': True,
+            'uid': True,
+            f'variations.{variation_name}': {
+                '$sub': Variation,
+                'content_type': True,
+                'ext': True,
+                'version': True
+            }
+        }
+
+        asset = self.get_asset(uid, projection=projection)
+        variation = (asset.variations or {}).get(variation_name)
+
+        if not variation:
+
+            # Check the limit on rendered variations for the asset
+            render_count = len([
+                n for n in self.get_variation_names(asset)
+                if n.startswith('render_')
+            ])
+            if render_count >= self.config['RENDER_MAX_VARIATIONS']:
+                raise APIError(
+                    'forbidden',
+                    hint=(
+                        'The maximum number of rendered variations for the '
+                        'asset has been reached.'
+                    )
+                )
+
+            # Render the variation
+            await self.render(asset, variation_name, transforms)
+
+            with Asset.with_options(read_preference=ReadPreference.PRIMARY):
+                asset = self.get_asset(uid, projection=projection)
+
+            variation = self.get_variation(asset, variation_name)
+
+        # Download the file (via the render cache if there is one, secure
+        # assets are never cached).
+        loop = asyncio.get_event_loop()
+        store_key = variation.get_store_key(asset, variation_name)
+        cache_key = self.get_cache_key(store_key)
+        cache = None if asset.secure else self.application.render_cache
+
+        file = None
+        if cache:
+            with self.phase('cache'):
+                file = await cache.async_get(cache_key, loop)
+
+            metrics.CACHE_REQUESTS.inc(
+                cache='render',
+                result='miss' if file is None else 'hit'
+            )
+
+        if file is None:
+            backend = self.get_backend(asset.secure)
+
+            with self.phase('backend'):
+                file = await backend.async_retrieve(store_key, loop=loop)
+
+            if cache:
+                with self.phase('cache'):
+                    await cache.async_set(cache_key, file, loop)
+
+        self.set_header(
+            'Content-Type',
+            variation.content_type or 'application/octet-stream'
+        )
+        self.write(file)
+
+    def encode_spec_value(self, value):
+        """
+        Return a setting's (coerced) value encoded as it's given in a spec,
+        booleans are given as `true` or `false` and other values (e.g
+        numbers) as their string representation.
+        """
+
+        if isinstance(value, bool):
+            return 'true' if value else 'false'
+
+        return str(value)
+
+    def get_canonical_spec(self, transforms):
+        """
+        Return the canonical spec for a list of (validated) transforms.
+        Settings that aren't set (`None`) are omitted, so parsing the
+        canonical spec gives back the same spec.
+        """
+
+        parts = []
+        for name, settings in transforms:
+
+            args = ','.join(
+                f'{k}={self.encode_spec_value(v)}'
+                for k, v in sorted(settings.items())
+                if v is not None
+            )
+
+            parts.append(f'{name}:{args}' if args else name)
+
+        return ';'.join(parts)
+
+    def get_variation_names(self, asset):
+        """Return the names of the variations stored against an asset"""
+
+        results = list(Asset.get_collection().aggregate([
+            {'$match': {'_id': asset._id}},
+            {
+                '$project': {
+                    'names': {
+                        '$map': {
+                            'input': {
+                                '$objectToArray': {
+                                    '$ifNull': ['$variations', {}]
+                                }
+                            },
+                            'in': '$$this.k'
+                        }
+                    }
+                }
+            }
+        ]))
+
+        return results[0]['names'] if results else []
+
+    def parse_spec(self, asset_type, spec):
+        """
+        Parse and validate a spec, returning a list of transforms
+        `[[name, settings], ...]` with the settings coerced to the types the
+        transforms expect.
+        """
+
+        transforms = []
+        for part in spec.split(';'):
+
+            name, _, args = part.partition(':')
+
+            settings = {}
+            for arg in filter(None, args.split(',')):
+                key, sep, value = arg.partition('=')
+
+                if not sep:
+                    raise APIError(
+                        'invalid_request',
+                        hint=f'Invalid transform setting: {arg} ({name}).'
+                    )
+
+                settings[key] = value
+
+            transforms.append([name, settings])
+
+        self.validate_variations(asset_type, {'render': transforms})
+
+        # Coerce the settings (values in the spec are all strings)
+        for transform in transforms:
+
+            transform_cls = get_transform(asset_type, transform[0])
+            _, transform[1] = validate_settings(
+                transform_cls.get_settings_form_cls(),
+                transform[1]
+            )
+
+        return transforms
+
+    async def render(self, asset, variation_name, transforms):
+        """
+        Generate the named variation for the asset (concurrent requests for
+        the same render wait on a single task, see
+        `add_variation_task_and_wait`).
+        """
+
+        # Rendered variations are versionless
+        transforms = [list(t) for t in transforms]
+        final_settings_form_cls = get_transform(
+            asset.type,
+            transforms[-1][0]
+        ).get_settings_form_cls()
+
+        if hasattr(final_settings_form_cls, 'versioned'):
+            transforms[-1][1] = {**transforms[-1][1], 'versioned': False}
+
+        event = await self.add_variation_task_and_wait(
+            GenerateVariationTask(
+                self.account._id,
+                asset._id,
+                variation_name,
+                transforms
+            )
+        )
+
+        if not event:
+            raise APIError('error', hint='Connection lost')
+
+        if event.type == 'task_error':
+            raise APIError('error', hint=event.reason)
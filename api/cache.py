@@ -0,0 +1,122 @@
+from collections import OrderedDict
+import time
+
+from backends.cache import DiskCache
+
+__all__ = [
+    'DiskCache',
+    'MemoryCache',
+    'TieredCache'
+]
+
+
+class MemoryCache:
+    """
+    A least recently used (LRU) cache of files held in memory (per process).
+    The total length (in bytes) of the files in the cache is limited, when
+    the limit is exceeded the least recently used files are removed.
+    """
+
+    def __init__(self, max_length):
+
+        # The maximum total length (in bytes) of the files in the cache
+        self._max_length = max_length
+
+        # An ordered table of the files in the cache
+        # `{key: (file, expires)}`, least recently used first.
+        self._entries = OrderedDict()
+
+        # The total length of the files in the cache
+        self._length = 0
+
+    def delete(self, key):
+        """Remove a file from the cache"""
+
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._length -= len(entry[0])
+
+    def get(self, key):
+        """Return a file from the cache, or `None` if it's not cached"""
+
+        entry = self._entries.get(key)
+        if not entry:
+            return None
+
+        file, expires = entry
+        if expires and expires <= time.time():
+            self.delete(key)
+            return None
+
+        self._entries.move_to_end(key)
+
+        return file
+
+    def set(self, key, file, expires=None):
+        """
+        Add a file to the cache, optionally the time (as a timestamp) after
+        which the file should no longer be returned can be specified.
+        """
+
+        if len(file) > self._max_length:
+            return
+
+        self.delete(key)
+
+        self._entries[key] = (file, expires)
+        self._length += len(file)
+
+        # Remove least recently used files until the cache is within limit
+        while self._length > self._max_length:
+            self.delete(next(iter(self._entries)))
+
+
+class TieredCache:
+    """
+    A read-through cache of files made up of an in-process `MemoryCache` and
+    (optionally) a `DiskCache` shared by the processes on a server. Files
+    found on disk are promoted to memory.
+    """
+
+    def __init__(self, memory_cache, disk_cache=None, max_file_length=None):
+
+        # The in-process memory cache
+        self._memory_cache = memory_cache
+
+        # The (optional) disk cache
+        self._disk_cache = disk_cache
+
+        # The maximum length (in bytes) of a file that will be cached
+        self._max_file_length = max_file_length
+
+    async def async_delete(self, key, loop):
+        """Asynchronous remove a file from the cache"""
+
+        self._memory_cache.delete(key)
+
+        if self._disk_cache:
+            await self._disk_cache.async_delete(key, loop)
+
+    async def async_get(self, key, loop):
+        """Asynchronous return a file from the cache"""
+
+        file = self._memory_cache.get(key)
+
+        if file is None and self._disk_cache:
+            file = await self._disk_cache.async_get(key, loop)
+
+            if file is not None:
+                self._memory_cache.set(key, file)
+
+        return file
+
+    async def async_set(self, key, file, loop, expires=None):
+        """Asynchronous add a file to the cache"""
+
+        if self._max_file_length and len(file) > self._max_file_length:
+            return
+
+        self._memory_cache.set(key, file, expires)
+
+        if self._disk_cache:
+            await self._disk_cache.async_set(key, file, loop)
@@ -0,0 +1,48 @@
+import tornado.web
+
+import metrics
+from workers.counters import async_get_counters
+from workers.tasks import AnalyzeTask, GenerateVariationTask
+
+__all__ = ['MetricsHandler']
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """
+    Expose the API process's metrics, along with the state of the task queue,
+    in the Prometheus text format.
+    """
+
+    async def get(self):
+
+        # Only allowed IP addresses can view metrics
+        ip_address = self.request.headers.get(
+            'X-Real-Ip',
+            self.request.remote_ip
+        )
+        allowed_ip_addresses = self.application.config[
+            'API_METRICS_ALLOWED_IP_ADDRESSES'
+        ]
+
+        if ip_address not in allowed_ip_addresses:
+            raise tornado.web.HTTPError(404)
+
+        # Update the task queue gauges
+        counters = await async_get_counters(
+            self.application.redis,
+            [AnalyzeTask, GenerateVariationTask]
+        )
+
+        for task, task_counters in counters['tasks'].items():
+            metrics.TASKS_QUEUED.set(task_counters['queued'], task=task)
+            metrics.TASKS_RUNNING.set(task_counters['running'], task=task)
+            metrics.TASKS_FAILED.set(task_counters['failed'], task=task)
+            metrics.TASKS_OLDEST_AGE_SECONDS.set(
+                task_counters['oldest_age'] or 0,
+                task=task
+            )
+
+        metrics.WORKERS.set(counters['workers'])
+
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(metrics.render())
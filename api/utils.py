@@ -1,3 +1,7 @@
+import copy
+import functools
+import json
+
 from manhattan.forms import BaseForm, fields, validators, utils as form_utils
 from mongoframes import And, Q, SortBy
 from werkzeug.datastructures import MultiDict
@@ -10,10 +14,18 @@ __init__ = [
 
     # Functions
     'paginate',
-    'to_multi_dict'
+    'parse_range',
+    'to_multi_dict',
+    'validate_settings'
 ]
 
 
+# Constants
+
+# The maximum number of validated settings cached (per process)
+SETTINGS_CACHE_SIZE = 1024
+
+
 # Classes
 
 class PaginationForm(BaseForm):
@@ -91,6 +103,45 @@ def paginate(
         'url': url
     }
 
+def parse_range(range_header, length):
+    """
+    Parse a (single) byte range from a `Range` header and return it as a
+    `(start, end)` tuple (where end is exclusive) for a file of the given
+    length.
+
+    `None` is returned if the header isn't a single byte range that can be
+    parsed (in which case the header should be ignored), and a `ValueError`
+    is raised if the range can't be satisfied.
+    """
+
+    unit, _, byte_range = range_header.partition('=')
+    if unit.strip() != 'bytes' or ',' in byte_range:
+        return None
+
+    start, sep, end = byte_range.strip().partition('-')
+    if not sep:
+        return None
+
+    try:
+        start = int(start) if start else None
+        end = int(end) if end else None
+
+    except ValueError:
+        return None
+
+    if start is None:
+
+        # Suffix range (the last n bytes)
+        if not end:
+            raise ValueError('Range not satisfiable')
+
+        return max(0, length - end), length
+
+    if start >= length or (end is not None and end < start):
+        raise ValueError('Range not satisfiable')
+
+    return start, min(length, end + 1) if end is not None else length
+
 def to_multi_dict(arguments):
     """
     Convert a dictionary of the form provided by `request.arguments` into a
@@ -102,3 +153,35 @@ def to_multi_dict(arguments):
         pairs.extend([(key, v.decode('utf8')) for v in values])
 
     return MultiDict(pairs)
+
+def validate_settings(form_cls, settings):
+    """
+    Validate a dictionary of settings (e.g for an analyzer or transform)
+    against a settings form, returning a tuple of the form's errors (or
+    `None` if the settings are valid) and the settings coerced by the form.
+
+    Results are cached against the form class and the canonical (key sorted)
+    JSON for the settings, so identical settings (common across bulk
+    requests) are only validated once. The cached results are shared, so
+    callers are given a copy of them.
+    """
+    errors, data = _validate_settings(
+        form_cls,
+        json.dumps(settings, sort_keys=True, separators=(',', ':'))
+    )
+    return copy.deepcopy(errors), copy.deepcopy(data)
+
+@functools.lru_cache(maxsize=SETTINGS_CACHE_SIZE)
+def _validate_settings(form_cls, canonical_settings):
+    """Validate settings (see `validate_settings`)"""
+
+    settings = json.loads(canonical_settings)
+    form = form_cls(
+        MultiDict({k: v for k, v in settings.items() if v is not None})
+    )
+
+    errors = None
+    if not form.validate():
+        errors = form.errors
+
+    return errors, {k: form[k].data for k in settings if k in form}
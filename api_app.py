@@ -3,6 +3,7 @@ import asyncio
 import json
 import logging
 import os
+import socket
 
 import aioredis
 from flask import Config
@@ -13,8 +14,11 @@ from sentry_sdk.integrations.logging import LoggingIntegration
 from sentry_sdk.integrations.redis import RedisIntegration
 from sentry_sdk.integrations.tornado import TornadoIntegration
 import swm
+import tornado.ioloop
 
 import api
+from api.cache import DiskCache, MemoryCache, TieredCache
+import profiler
 
 
 # Classes
@@ -24,11 +28,12 @@ class Application(swm.servers.Application):
     The API application.
     """
 
-    def __init__(self, env):
+    def __init__(self, env, config_overrides=None):
 
         # Load settings
         self.config = Config(os.path.dirname(os.path.realpath(__file__)))
         self.config.from_object(f'settings.servers.{env}.Config')
+        self.config.update(config_overrides or {})
 
         # Sentry (logging)
         if self.config.get('SENTRY_DSN'):
@@ -80,13 +85,45 @@ class Application(swm.servers.Application):
                 (
                     r'/assets/(\w+)/variations/(\w+)/download',
                     api.assets.variations.DownloadHandler
-                )
+                ),
+                (
+                    r'/assets/(\w+)/render/([^/]+)',
+                    api.assets.variations.RenderHandler
+                ),
+
+                # Metrics
+                (r'/metrics', api.monitor.MetricsHandler)
             ],
             debug=self.config.get('DEBUG'),
             default_handler_class=api.APIErrorHandler,
             default_handler_args={'status_code': 404}
         )
 
+        # Set up the cache for rendered variations
+        self.render_cache = None
+        if self.config.get('RENDER_CACHE_PATH'):
+            self.render_cache = DiskCache(
+                self.config['RENDER_CACHE_PATH'],
+                self.config['RENDER_CACHE_MAX_LENGTH']
+            )
+
+        # Set up the cache for downloads
+        self.download_cache = None
+        if self.config.get('DOWNLOAD_CACHE_MAX_LENGTH'):
+
+            disk_cache = None
+            if self.config.get('DOWNLOAD_CACHE_PATH'):
+                disk_cache = DiskCache(
+                    self.config['DOWNLOAD_CACHE_PATH'],
+                    self.config['DOWNLOAD_CACHE_PATH_MAX_LENGTH']
+                )
+
+            self.download_cache = TieredCache(
+                MemoryCache(self.config['DOWNLOAD_CACHE_MAX_LENGTH']),
+                disk_cache,
+                self.config['DOWNLOAD_CACHE_MAX_FILE_LENGTH']
+            )
+
         loop = asyncio.get_event_loop()
 
         # Set up redis connections
@@ -98,6 +135,27 @@ class Application(swm.servers.Application):
             self.listen_for_task_events(self._redis_sub, 'h51_events')
         )
 
+        # Profiler
+        self.profiler = profiler.SamplingProfiler(
+            self.config['PROFILE_PATH'],
+            f'api_{socket.gethostname()}_{os.getpid()}',
+            self.config['PROFILE_INTERVAL']
+        )
+
+        # The Id of the last profiler control message acted on
+        self._profile_message_id = None
+
+        if self.config['PROFILE_PATH']:
+
+            if self.config['PROFILE']:
+                self.profiler.start(self.config['PROFILE_WINDOW'], repeat=True)
+
+            # Check for control messages requesting the API profiles
+            tornado.ioloop.PeriodicCallback(
+                self._update_profiler,
+                1000
+            ).start()
+
         # Mongo database
         self.mongo = pymongo.MongoClient(self.config.get('MONGO_URI'))
         self.db = self.mongo.get_default_database()
@@ -128,11 +186,26 @@ class Application(swm.servers.Application):
                 loop=loop
             )
 
+    async def _update_profiler(self):
+        """
+        Start profiling if a control message requesting the API profiles has
+        been sent (see `profiler.send_control_message`).
+        """
+
+        message = await self._redis.get(profiler.get_control_key('api'))
+        if not message:
+            return
+
+        message = json.loads(message)
+        if message['id'] != self._profile_message_id:
+            self._profile_message_id = message['id']
+            self.profiler.start(message['window'])
+
 
 # Functions
 
-def create_app(env):
-    return Application(env)
+def create_app(env, config_overrides=None):
+    return Application(env, config_overrides)
 
 
 # Main
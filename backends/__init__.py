@@ -62,6 +62,13 @@ class BaseBackend(metaclass=BaseBackendMeta):
         """Delete a file from the store"""
         raise NotImplementedError()
 
+    def get_local_path(self, key):
+        """
+        Return the path to a file on the local file system, or `None` if the
+        backend doesn't store files on the local file system.
+        """
+        return None
+
     def retrieve(self, key):
         """Retrieve a file from the store"""
         raise NotImplementedError()
@@ -82,6 +89,14 @@ class BaseBackend(metaclass=BaseBackendMeta):
         """Asynchronous store a file"""
         raise NotImplementedError()
 
+    @classmethod
+    def get_executor(cls):
+        """
+        Return the executor used to perform blocking I/O for the backend, or
+        `None` to use the event loop's default executor.
+        """
+        return None
+
     @classmethod
     def get_settings_form_cls(cls):
         """
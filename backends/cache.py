@@ -0,0 +1,147 @@
+import hashlib
+import os
+import tempfile
+import threading
+
+__all__ = ['DiskCache']
+
+
+class DiskCache:
+    """
+    A least recently used (LRU) cache of files stored on the local disk. The
+    total length (in bytes) of the files in the cache is limited, when the
+    limit is exceeded the least recently used files are removed.
+
+    The cache directory can be shared by multiple processes. Files are written
+    atomically, a file's modified time is updated when it's read (and used to
+    determine which files were least recently used), and the limit is
+    enforced by scanning the directory, so it applies to the files added by
+    all processes.
+
+    The directory is scanned each time the process has added a fraction (see
+    `scan_ratio`) of the limit to the cache, so between scans the cache can
+    exceed the limit by that fraction for each process using it.
+    """
+
+    # The fraction of the cache's maximum length a process can add to the
+    # cache between scans of the directory.
+    scan_ratio = 0.1
+
+    def __init__(self, path, max_length):
+
+        # The directory the cached files are stored in
+        self._path = path
+
+        # The maximum total length (in bytes) of the files in the cache
+        self._max_length = max_length
+
+        # The total length of the files added by this process since the
+        # directory was last scanned.
+        self._added_length = 0
+
+        # A lock used to guard the added length and scans (the cache is
+        # typically read from and written to within an executor's threads).
+        self._lock = threading.Lock()
+
+        os.makedirs(self._path, exist_ok=True)
+
+        with self._lock:
+            self._evict()
+
+    def delete(self, key):
+        """Remove a file from the cache"""
+        try:
+            os.remove(self._get_path(key))
+        except FileNotFoundError:
+            pass
+
+    def get(self, key):
+        """Return a file from the cache, or `None` if it's not cached"""
+
+        path = self._get_path(key)
+
+        try:
+            with open(path, 'rb') as f:
+                file = f.read()
+
+            # Mark the file as recently used
+            os.utime(path)
+
+        except FileNotFoundError:
+            return None
+
+        return file
+
+    def set(self, key, file):
+        """Add a file to the cache"""
+
+        if len(file) > self._max_length:
+            return
+
+        # Write the file to a temporary file and move it into place so that
+        # partially written files are never read.
+        fd, tmp_path = tempfile.mkstemp(prefix='.', dir=self._path)
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(file)
+            os.replace(tmp_path, self._get_path(key))
+
+        except:
+            os.remove(tmp_path)
+            raise
+
+        with self._lock:
+            self._added_length += len(file)
+            if self._added_length >= self._max_length * self.scan_ratio:
+                self._evict()
+
+    async def async_delete(self, key, loop):
+        """Asynchronous remove a file from the cache"""
+        await loop.run_in_executor(None, self.delete, key)
+
+    async def async_get(self, key, loop):
+        """Asynchronous return a file from the cache"""
+        return await loop.run_in_executor(None, self.get, key)
+
+    async def async_set(self, key, file, loop):
+        """Asynchronous add a file to the cache"""
+        await loop.run_in_executor(None, self.set, key, file)
+
+    def _evict(self):
+        """
+        Scan the cache directory and remove the least recently used files
+        until the cache is within limit.
+        """
+
+        self._added_length = 0
+
+        entries = []
+        length = 0
+        for entry in os.scandir(self._path):
+            if entry.name.startswith('.'):
+                continue
+
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+
+            entries.append((stat.st_mtime, entry.path, stat.st_size))
+            length += stat.st_size
+
+        for _, path, file_length in sorted(entries):
+            if length <= self._max_length:
+                break
+
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+            length -= file_length
+
+    def _get_path(self, key):
+        return os.path.join(
+            self._path,
+            hashlib.sha1(key.encode('utf8')).hexdigest()
+        )
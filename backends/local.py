@@ -1,5 +1,11 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
 import io
 import os
+import shutil
+import tempfile
+import threading
 
 from manhattan.forms import BaseForm, fields, validators
 
@@ -8,6 +14,16 @@ from . import BaseBackend
 __all__ = ['LocalBackend']
 
 
+# Constants
+
+# The permissions files are stored with, as for a file created with `open`
+# (`mkstemp` creates files only the owner can read). The umask can only be
+# read by setting it, so we read it once on import.
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
 class SettingsForm(BaseForm):
 
     files_path = fields.StringField(
@@ -27,6 +43,8 @@ class SettingsForm(BaseForm):
         if not os.path.exists(field.data):
             raise validators.ValidationError('Path does not exist.')
 
+    sharded = fields.BooleanField('Sharded')
+
 
 class LocalBackend(BaseBackend):
     """
@@ -35,9 +53,44 @@ class LocalBackend(BaseBackend):
 
     name = 'local'
 
-    def __init__(self, files_path, **kw):
+    # The maximum number of threads used to perform asynchronous file I/O
+    # (shared by all instances of the backend within a process).
+    max_io_threads = 8
+
+    # The size (in bytes) of the chunks files are copied in when stored
+    store_chunk_size = 1024 * 64
+
+    # The thread pool used to perform asynchronous file I/O
+    _executor = None
+    _executor_lock = threading.Lock()
+
+    # A set of the directories known to exist, used to avoid calling
+    # `os.makedirs` every time a file is stored.
+    _known_dirs = set()
+
+    def __init__(self, files_path, sharded=False, **kw):
         self.files_path = files_path
 
+        # Flag indicating if files are stored in sub-directories (shards)
+        # named after a hash of their key (e.g `ab/cd/{key}`), rather than
+        # all within the files path. Files not yet migrated to a shard (see
+        # `shard`) are still found in the files path.
+        self.sharded = sharded
+
+    def get_local_path(self, key):
+        """Return the path to a file on the local file system"""
+
+        if not self.is_safe_key(key):
+            raise PermissionError('Not a safe key')
+
+        path = self._get_path(key)
+        if self.sharded and not os.path.exists(path):
+            unsharded_path = self._get_path(key, sharded=False)
+            if os.path.exists(unsharded_path):
+                return unsharded_path
+
+        return path
+
     def is_safe_key(self, key):
         """Return True if the given file path is safe"""
         path = os.path.realpath(os.path.join(self.files_path, key))
@@ -50,10 +103,15 @@ class LocalBackend(BaseBackend):
             raise PermissionError('Not a safe key')
 
         # Remove the file if it exists
-        path = os.path.join(self.files_path, key)
+        paths = [self._get_path(key)]
+        if self.sharded:
+            paths.append(self._get_path(key, sharded=False))
 
-        if os.path.exists(path):
-            os.remove(path)
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
 
     def retrieve(self, key):
         """Retrieve a file from the store"""
@@ -62,40 +120,150 @@ class LocalBackend(BaseBackend):
             raise PermissionError('Not a safe key')
 
         # Return the file as a byte stream
-        path =  os.path.join(self.files_path, key)
-        with open(path, 'rb') as f:
-            stream = f.read()
+        try:
+            with open(self._get_path(key), 'rb') as f:
+                return f.read()
+
+        except FileNotFoundError:
+            if not self.sharded:
+                raise
+
+        with open(self._get_path(key, sharded=False), 'rb') as f:
+            return f.read()
+
+    def shard(self, key):
+        """
+        Move a file stored in the files path into its shard, return True if
+        the file was moved. This allows existing stores to be migrated to a
+        sharded layout whilst in use.
+
+        If the file already exists in its shard (e.g it was stored again after
+        sharding was enabled) the sharded file is newer and the unsharded file
+        is removed instead.
+        """
+
+        assert self.sharded, 'The backend is not sharded'
+
+        if not self.is_safe_key(key):
+            raise PermissionError('Not a safe key')
 
-        return stream
+        path = self._get_path(key)
+        unsharded_path = self._get_path(key, sharded=False)
+
+        self._ensure_dir(os.path.dirname(path))
+
+        # Link (rather than move) the file into its shard so that a file
+        # already stored in the shard is never overwritten.
+        moved = True
+        try:
+            os.link(unsharded_path, path)
+
+        except FileNotFoundError:
+            return False
+
+        except FileExistsError:
+            moved = False
+
+        try:
+            os.remove(unsharded_path)
+        except FileNotFoundError:
+            pass
+
+        return moved
 
     def store(self, f, key):
-        """Store a file"""
+        """
+        Store a file. The file is written to a temporary file which is then
+        moved into place, so readers never see a partially written file.
+        """
 
         if not self.is_safe_key(key):
             raise PermissionError('Not a safe key')
 
         # Determine the storage location
-        path, filename = os.path.split(key)
-        path = os.path.join(self.files_path, path)
+        path, filename = os.path.split(self._get_path(key))
 
         # Ensure the location exists
-        os.makedirs(path, exist_ok=True)
+        self._ensure_dir(path)
 
         # Save the file
-        with open(os.path.join(path, filename), 'wb') as store:
-            store.write(f.read())
+        try:
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', dir=path)
+
+        except FileNotFoundError:
+
+            # The directory has been removed since we last ensured it existed
+            self._known_dirs.discard(path)
+            self._ensure_dir(path)
+            fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', dir=path)
+
+        try:
+            os.fchmod(fd, FILE_MODE)
+
+            with os.fdopen(fd, 'wb') as store:
+                shutil.copyfileobj(f, store, self.store_chunk_size)
+                store.flush()
+                os.fsync(store.fileno())
+
+            os.replace(tmp_path, os.path.join(path, filename))
+
+        except:
+            os.remove(tmp_path)
+            raise
 
     async def async_delete(self, key, loop=None):
         """Asynchronous delete a file from the store"""
-        self.delete(key)
+        await self._run_in_executor(loop, self.delete, key)
 
     async def async_retrieve(self, key, loop=None):
         """Asynchronous retrieve a file from the store"""
-        return self.retrieve(key)
+        return await self._run_in_executor(loop, self.retrieve, key)
 
     async def async_store(self, f, key, loop=None):
         """Asynchronous store a file"""
-        self.store(f, key)
+        await self._run_in_executor(loop, self.store, f, key)
+
+    def _ensure_dir(self, path):
+        """Ensure a directory exists"""
+        if path not in self._known_dirs:
+            os.makedirs(path, exist_ok=True)
+            self._known_dirs.add(path)
+
+    def _get_path(self, key, sharded=None):
+        """Return the path a file is stored at"""
+
+        if sharded is None:
+            sharded = self.sharded
+
+        if sharded:
+            key_hash = hashlib.sha1(key.encode('utf8')).hexdigest()
+            return os.path.join(
+                self.files_path,
+                key_hash[:2],
+                key_hash[2:4],
+                key
+            )
+
+        return os.path.join(self.files_path, key)
+
+    def _run_in_executor(self, loop, func, *args):
+        """Run a blocking function on the backend's thread pool"""
+
+        loop = loop or asyncio.get_event_loop()
+        return loop.run_in_executor(self.get_executor(), func, *args)
+
+    @classmethod
+    def get_executor(cls):
+        """Return the thread pool used to perform asynchronous file I/O"""
+
+        with cls._executor_lock:
+            if not cls._executor:
+                cls._executor = ThreadPoolExecutor(
+                    max_workers=cls.max_io_threads,
+                    thread_name_prefix='h51_local_backend'
+                )
+
+        return cls._executor
 
     @classmethod
     def get_settings_form_cls(cls):
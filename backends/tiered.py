@@ -0,0 +1,184 @@
+import asyncio
+import io
+import os
+import threading
+
+from manhattan.forms import fields, validators
+
+import metrics
+
+from . import BaseBackend
+from .cache import DiskCache
+from .s3 import S3Backend, SettingsForm as S3SettingsForm
+
+__all__ = [
+    'TieredBackend',
+    'TieredS3Backend'
+]
+
+
+class TieredS3SettingsForm(S3SettingsForm):
+
+    cache_path = fields.StringField(
+        'Cache path',
+        [validators.Required()]
+    )
+
+    cache_max_length = fields.IntegerField(
+        'Cache size (bytes)',
+        [
+            validators.Required(),
+            validators.NumberRange(min=1)
+        ],
+        default=1024 * 1024 * 1024 * 10
+    )
+
+    def validate_cache_path(form, field):
+        # Check the path given for the cache exists
+
+        if not field.data:
+            return
+
+        if field.data[0] != '/':
+            raise validators.ValidationError('Path must be absolute')
+
+        if not os.path.exists(field.data):
+            raise validators.ValidationError('Path does not exist.')
+
+
+class TieredBackend(BaseBackend):
+    """
+    Store files using a primary backend with a size limited cache of files on
+    the local disk in front of it.
+
+    Files are written through the cache when stored, read through the cache
+    when retrieved, and removed from the cache when deleted. The cache
+    directory can be shared by all the processes (API servers and workers)
+    on a host, and by backends for different accounts (files are cached
+    against the identity of the primary backend as well as their key, see
+    `get_cache_namespace`).
+    """
+
+    exclude_from_register = True
+
+    # The class of primary backend (set by inheriting classes)
+    primary_backend_cls = None
+
+    # A table of disk caches `{path: DiskCache}` shared by all instances of
+    # the backend within a process (backends are created per request/task).
+    _caches = {}
+    _caches_lock = threading.Lock()
+
+    def __init__(self, cache_path, cache_max_length, **kw):
+
+        # The backend files are stored in
+        self.primary_backend = self.primary_backend_cls(**kw)
+
+        # The local disk cache
+        self.cache = self.get_cache(cache_path, cache_max_length)
+
+    def delete(self, key):
+        """Delete a file from the store"""
+        self.primary_backend.delete(key)
+        self.cache.delete(self._get_cache_key(key))
+
+    def get_cache_namespace(self):
+        """
+        Return a string that identifies the primary backend's store (e.g the
+        S3 bucket), files are cached against the namespace and their key so
+        that backends for different stores sharing a cache directory never
+        read each other's files.
+        """
+        raise NotImplementedError()
+
+    def retrieve(self, key):
+        """Retrieve a file from the store"""
+
+        cache_key = self._get_cache_key(key)
+
+        file = self.cache.get(cache_key)
+        self._count_cache_request(file)
+
+        if file is None:
+            file = self.primary_backend.retrieve(key)
+            self.cache.set(cache_key, file)
+
+        return file
+
+    def store(self, f, key):
+        """Store a file"""
+        file = f.read()
+        self.primary_backend.store(io.BytesIO(file), key)
+        self.cache.set(self._get_cache_key(key), file)
+
+    async def async_delete(self, key, loop=None):
+        """Asynchronous delete a file from the store"""
+        loop = loop or asyncio.get_event_loop()
+        await self.primary_backend.async_delete(key, loop=loop)
+        await self.cache.async_delete(self._get_cache_key(key), loop)
+
+    async def async_retrieve(self, key, loop=None):
+        """Asynchronous retrieve a file from the store"""
+
+        loop = loop or asyncio.get_event_loop()
+        cache_key = self._get_cache_key(key)
+
+        file = await self.cache.async_get(cache_key, loop)
+        self._count_cache_request(file)
+
+        if file is None:
+            file = await self.primary_backend.async_retrieve(key, loop=loop)
+            await self.cache.async_set(cache_key, file, loop)
+
+        return file
+
+    async def async_store(self, f, key, loop=None):
+        """Asynchronous store a file"""
+        loop = loop or asyncio.get_event_loop()
+        file = f.read()
+        await self.primary_backend.async_store(io.BytesIO(file), key, loop=loop)
+        await self.cache.async_set(self._get_cache_key(key), file, loop)
+
+    def _count_cache_request(self, file):
+        """Record a cache lookup (hit or miss) in the metrics"""
+        metrics.CACHE_REQUESTS.inc(
+            cache='backend',
+            result='miss' if file is None else 'hit'
+        )
+
+    def _get_cache_key(self, key):
+        """Return the key a file is cached against"""
+        return ':'.join([
+            self.primary_backend.name,
+            self.get_cache_namespace(),
+            key
+        ])
+
+    @classmethod
+    def get_cache(cls, path, max_length):
+        """Return the disk cache for the given path"""
+
+        with cls._caches_lock:
+            if path not in cls._caches:
+                cls._caches[path] = DiskCache(path, max_length)
+
+        return cls._caches[path]
+
+
+class TieredS3Backend(TieredBackend):
+    """
+    Store files on AWS S3 with a local disk cache in front.
+    """
+
+    exclude_from_register = False
+
+    name = 's3_tiered'
+
+    primary_backend_cls = S3Backend
+
+    def get_cache_namespace(self):
+        return self.primary_backend.bucket
+
+    @classmethod
+    def get_settings_form_cls(cls, **config):
+        return TieredS3SettingsForm
@@ -0,0 +1,4 @@
+"""
+Benchmarks for measuring the performance of H51's components outside of a
+production environment.
+"""
@@ -0,0 +1,632 @@
+"""
+Load test the API against local stand-ins.
+
+The API application is started in process against a dedicated Mongo
+database and Redis database, a temporary account is seeded with assets
+stored using a `LocalBackend` (in a temporary directory), and tasks are
+completed by fake in-process workers (which complete each task after a fixed
+delay without performing it).
+
+Requests are either generated from a synthetic mix of request types or
+replayed from a recorded API log (a JSON list of API log entries), and are
+made at the given concurrency. Latency percentiles for each route, and for
+each phase of handling the request (as reported by the `Server-Timing`
+header), are reported as JSON.
+
+Usage:
+
+    python -m benchmarks.api -c 20 -n 2000
+    python -m benchmarks.api -c 20 --replay api_log.json
+"""
+
+import argparse
+import asyncio
+from collections import defaultdict, deque
+import io
+import json
+import random
+import re
+import shutil
+import tempfile
+import threading
+import time
+import uuid
+from urllib.parse import urlencode
+
+from PIL import Image
+import redis
+from swm.events import TaskCompleteEvent
+from tornado.httpclient import AsyncHTTPClient
+
+import api_app
+from backends.local import LocalBackend
+from blueprints.accounts.models import Account, Stats
+from blueprints.assets.models import Asset, Variation
+from workers.tasks import AnalyzeTask, GenerateVariationTask
+
+__all__ = ['run']
+
+
+# Constants
+
+# The default mix of requests made in a synthetic benchmark
+# `{request_type: weight}`.
+DEFAULT_MIX = {
+    'download': 50,
+    'download_variation': 30,
+    'list': 10,
+    'generate_variations': 5,
+    'upload': 5
+}
+
+# The variations generated by `generate_variations` requests
+VARIATIONS = {
+    'benchmark': [
+        ['fit', {'width': 200, 'height': 200}],
+        ['output', {'image_format': 'JPEG'}]
+    ]
+}
+
+# Path segments following `/assets/` that are not asset uids
+COLLECTION_PATHS = {'analyze', 'expire', 'persist', 'transform'}
+
+
+# Classes
+
+class FakeWorker(threading.Thread):
+    """
+    A stand-in for an `AssetWorker` that completes tasks (without performing
+    them) after a fixed delay.
+    """
+
+    def __init__(self, conn, task_time):
+        super().__init__(daemon=True)
+
+        # The redis connection used to claim tasks and broadcast events
+        self._conn = conn
+
+        # The time (in seconds) taken to complete each task
+        self._task_time = task_time
+
+        # An event set to stop the worker
+        self._stopped = threading.Event()
+
+    def run(self):
+
+        task_clses = [AnalyzeTask, GenerateVariationTask]
+
+        while not self._stopped.is_set():
+
+            for task_cls in task_clses:
+                prefix = task_cls.get_id_prefix()
+                for task_id in self._conn.scan_iter(f'{prefix}:*'):
+
+                    data = self._conn.get(task_id)
+                    if not data:
+                        continue
+
+                    task = task_cls.loads(data)
+
+                    # Claim the task (only one worker will acquire the lock)
+                    if not self._conn.set(task.lock_key, 1, nx=True):
+                        continue
+
+                    time.sleep(self._task_time)
+
+                    # Complete the task as an `AssetWorker` would, releasing
+                    # the flight for variation tasks before the task is
+                    # removed.
+                    if isinstance(task, GenerateVariationTask):
+                        task.release_flight(self._conn)
+
+                    self._conn.delete(task_id)
+                    self._conn.delete(task.lock_key)
+
+                    self._conn.publish(
+                        'h51_events',
+                        TaskCompleteEvent(task_id, {}).dumps()
+                    )
+
+            self._stopped.wait(0.01)
+
+    def stop(self):
+        self._stopped.set()
+
+
+# Functions
+
+def encode_multipart(fields, files):
+    """
+    Return a content type and body for a multipart form containing the given
+    fields (`{name: value}`) and files (`{name: (filename, content)}`).
+    """
+
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+
+    for name, value in fields.items():
+        body.write(
+            (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"\r\n\r\n'
+                f'{value}\r\n'
+            ).encode('utf8')
+        )
+
+    for name, (filename, content) in files.items():
+        body.write(
+            (
+                f'--{boundary}\r\n'
+                f'Content-Disposition: form-data; name="{name}"; '
+                f'filename="{filename}"\r\n'
+                'Content-Type: application/octet-stream\r\n\r\n'
+            ).encode('utf8')
+        )
+        body.write(content)
+        body.write(b'\r\n')
+
+    body.write(f'--{boundary}--\r\n'.encode('utf8'))
+
+    return f'multipart/form-data; boundary={boundary}', body.getvalue()
+
+def get_sample(path=None):
+    """Return the sample file used for uploads and seeded assets"""
+
+    if path:
+        with open(path, 'rb') as f:
+            return f.read()
+
+    f = io.BytesIO()
+    Image.effect_noise((800, 600), 40).convert('RGB').save(f, format='PNG')
+    return f.getvalue()
+
+def percentile(values, p):
+    """Return the p-th percentile of the given values (nearest rank)"""
+    values = sorted(values)
+    return values[max(0, int(round(p / 100 * len(values))) - 1)]
+
+def parse_server_timing(header):
+    """Parse a `Server-Timing` header into a map of `{phase: seconds}`"""
+
+    phases = {}
+    for metric in filter(None, [m.strip() for m in header.split(',')]):
+        name, *params = [p.strip() for p in metric.split(';')]
+        for param in params:
+            if param.startswith('dur='):
+                phases[name] = float(param[4:]) / 1000
+
+    return phases
+
+def seed(files_path, sample, asset_count):
+    """
+    Seed a temporary account with a set of assets (each with a variation) to
+    run the benchmark against.
+    """
+
+    account = Account(
+        name=f'benchmark-{uuid.uuid4().hex}',
+        api_key=uuid.uuid4().hex,
+        api_rate_limit_per_second=10 ** 9,
+        public_backend_settings={
+            '_backend': LocalBackend.name,
+            'files_path': files_path
+        }
+    )
+    account.insert()
+
+    backend = account.public_backend
+    image = Image.open(io.BytesIO(sample))
+
+    uids = []
+    for i in range(asset_count):
+
+        asset = Asset(
+            uid=Asset.generate_uid(),
+            account=account,
+            secure=False,
+            name='benchmark',
+            ext=image.format.lower(),
+            type='image',
+            content_type=Image.MIME.get(image.format),
+            meta={
+                'filename': f'benchmark.{image.format.lower()}',
+                'length': len(sample),
+                'image': {
+                    'mode': image.mode,
+                    'size': image.size
+                }
+            },
+            variations={
+                'thumb': Variation(
+                    content_type=Image.MIME.get(image.format),
+                    ext=image.format.lower(),
+                    meta={
+                        'length': len(sample),
+                        'image': {
+                            'mode': image.mode,
+                            'size': image.size
+                        }
+                    },
+                    version=Variation.next_version()
+                )
+            }
+        )
+
+        backend.store(io.BytesIO(sample), asset.store_key)
+        backend.store(
+            io.BytesIO(sample),
+            asset.variations['thumb'].get_store_key(asset, 'thumb')
+        )
+        asset.insert()
+
+        uids.append(asset.uid)
+
+    return account, uids
+
+def clean_up(account, files_path):
+    """Remove the temporary account, its assets and files"""
+
+    Asset.get_collection().delete_many({'account': account._id})
+    Stats.get_collection().delete_many({'scope': account._id})
+    account.delete()
+
+    shutil.rmtree(files_path, ignore_errors=True)
+
+def get_synthetic_requests(mix, count, uids, sample):
+    """Return a list of requests generated from the given mix"""
+
+    request_types = list(mix.keys())
+    weights = list(mix.values())
+
+    requests = []
+    for request_type in random.choices(request_types, weights, k=count):
+        uid = random.choice(uids)
+
+        if request_type == 'download':
+            requests.append({'method': 'GET', 'path': f'/assets/{uid}/download'})
+
+        elif request_type == 'download_variation':
+            requests.append({
+                'method': 'GET',
+                'path': f'/assets/{uid}/variations/thumb/download'
+            })
+
+        elif request_type == 'list':
+            requests.append({'method': 'GET', 'path': '/assets?limit=10'})
+
+        elif request_type == 'generate_variations':
+            requests.append({
+                'method': 'PUT',
+                'path': f'/assets/{uid}/variations',
+                'body': urlencode({'variations': json.dumps(VARIATIONS)})
+            })
+
+        elif request_type == 'upload':
+            content_type, body = encode_multipart(
+                {'name': 'benchmark'},
+                {'file': ('benchmark.png', sample)}
+            )
+            requests.append({
+                'method': 'PUT',
+                'path': '/assets',
+                'headers': {'Content-Type': content_type},
+                'body': body
+            })
+
+    return requests
+
+def get_replay_requests(entries, uids, sample):
+    """
+    Return a list of requests to replay from the given API log entries, uids
+    in the recorded requests are mapped to the seeded assets.
+    """
+
+    uid_map = {}
+    def map_uid(uid):
+        if uid not in uid_map:
+            uid_map[uid] = uids[len(uid_map) % len(uids)]
+        return uid_map[uid]
+
+    requests = []
+    for entry in entries:
+
+        path = entry['path']
+        match = re.match(r'^/assets/(\w+)', path)
+        if match and match.group(1) not in COLLECTION_PATHS:
+            path = f'/assets/{map_uid(match.group(1))}{path[match.end():]}'
+
+        args = []
+        for key, values in entry.get('request', {}).items():
+            if key == '__body__':
+                continue
+
+            for value in values:
+                args.append((key, map_uid(value) if key == 'uids' else value))
+
+        request = {'method': entry['method'], 'path': path}
+
+        if entry['method'] in ['GET', 'DELETE']:
+            if args:
+                request['path'] = f'{path}?{urlencode(args)}'
+
+        elif entry['method'] == 'PUT' and path == '/assets':
+            content_type, body = encode_multipart(
+                dict(args),
+                {'file': ('benchmark.png', sample)}
+            )
+            request['headers'] = {'Content-Type': content_type}
+            request['body'] = body
+
+        else:
+            request['body'] = urlencode(args)
+
+        requests.append(request)
+
+    return requests
+
+def get_route(app, method, path):
+    """Return the route (method and URL pattern) a request is handled by"""
+
+    path = path.split('?', 1)[0]
+    for rule in app.wildcard_router.rules:
+        if rule.matcher.regex.match(path):
+            return f'{method} {rule.matcher.regex.pattern.rstrip("$")}'
+
+    return f'{method} {path}'
+
+async def run(app, port, api_key, requests, concurrency):
+    """
+    Make the given requests against the API at the given concurrency and
+    return the result (route, status, latency and phase times) for each.
+    """
+
+    client = AsyncHTTPClient(max_clients=concurrency)
+    queue = deque(requests)
+    results = []
+
+    async def consume():
+        while queue:
+            request = queue.popleft()
+
+            started = time.perf_counter()
+            response = await client.fetch(
+                f'http://127.0.0.1:{port}{request["path"]}',
+                method=request['method'],
+                headers={
+                    'X-H51-APIKey': api_key,
+                    **request.get('headers', {})
+                },
+                body=request.get('body')
+                        if request['method'] in ['POST', 'PUT'] else None,
+                raise_error=False,
+                request_timeout=300
+            )
+
+            results.append({
+                'route': get_route(app, request['method'], request['path']),
+                'status': response.code,
+                'latency': time.perf_counter() - started,
+                'phases': parse_server_timing(
+                    response.headers.get('Server-Timing', '')
+                )
+            })
+
+    await asyncio.gather(*[consume() for _ in range(concurrency)])
+
+    return results
+
+def summarize(results, wall_time):
+    """Return a summary of latencies for each route and phase"""
+
+    def latencies(values):
+        return {
+            'p50': percentile(values, 50) * 1000,
+            'p90': percentile(values, 90) * 1000,
+            'p99': percentile(values, 99) * 1000,
+            'max': max(values) * 1000
+        }
+
+    routes = defaultdict(list)
+    for result in results:
+        routes[result['route']].append(result)
+
+    summary = {}
+    for route, route_results in sorted(routes.items()):
+
+        phases = defaultdict(list)
+        for result in route_results:
+            for phase, duration in result['phases'].items():
+                phases[phase].append(duration)
+
+        summary[route] = {
+            'requests': len(route_results),
+            'errors': len([
+                r for r in route_results
+                if not 200 <= r['status'] < 300
+            ]),
+            'latency_ms': latencies([r['latency'] for r in route_results]),
+            'phases_ms': {
+                phase: latencies(durations)
+                for phase, durations in sorted(phases.items())
+            }
+        }
+
+    return {
+        'requests': len(results),
+        'wall_time': wall_time,
+        'requests_per_second': len(results) / wall_time if wall_time else None,
+        'routes': summary
+    }
+
+
+# Main
+
+if __name__ == '__main__':
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Benchmark the API')
+    parser.add_argument(
+        '-e',
+        '--env',
+        choices=['staging', 'local', 'production', 'test'],
+        default='local',
+        dest='env',
+        required=False
+    )
+    parser.add_argument(
+        '-c',
+        '--concurrency',
+        default=10,
+        dest='concurrency',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-n',
+        '--requests',
+        default=1000,
+        dest='requests',
+        help='The number of synthetic requests to make',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '--mix',
+        default=None,
+        dest='mix',
+        help=(
+            'The mix of synthetic requests as a JSON object '
+            '(e.g {"download": 9, "upload": 1})'
+        ),
+        required=False
+    )
+    parser.add_argument(
+        '--replay',
+        default=None,
+        dest='replay',
+        help='A JSON file containing a list of API log entries to replay',
+        required=False
+    )
+    parser.add_argument(
+        '--assets',
+        default=100,
+        dest='assets',
+        help='The number of assets to seed',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '--sample',
+        default=None,
+        dest='sample',
+        help='An image file to use for uploads and seeded assets',
+        required=False
+    )
+    parser.add_argument(
+        '--workers',
+        default=2,
+        dest='workers',
+        help='The number of fake workers',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '--task-time',
+        default=0.05,
+        dest='task_time',
+        help='The time (in seconds) fake workers take to complete a task',
+        required=False,
+        type=float
+    )
+    parser.add_argument(
+        '--mongo-uri',
+        default='mongodb://localhost:27017/h51_benchmark',
+        dest='mongo_uri',
+        required=False
+    )
+    parser.add_argument(
+        '--redis-db',
+        default=15,
+        dest='redis_db',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-p',
+        '--port',
+        default=5055,
+        dest='port',
+        required=False,
+        type=int
+    )
+    args = parser.parse_args()
+
+    # Create the application against the benchmark databases
+    app = api_app.create_app(
+        args.env,
+        {
+            'API_SERVER_TIMING': True,
+            'MONGO_URI': args.mongo_uri,
+            'MONGO_PASSWORD': '',
+            'REDIS_DB': args.redis_db,
+            'SENTRY_DSN': ''
+        }
+    )
+    app.listen(args.port, max_buffer_size=app.config['MAX_BUFFER_SIZE'])
+
+    # Seed the account and assets
+    sample = get_sample(args.sample)
+    files_path = tempfile.mkdtemp(prefix='h51-benchmark-')
+    account, uids = seed(files_path, sample, args.assets)
+
+    # Start the fake workers
+    workers = []
+    for i in range(args.workers):
+        worker = FakeWorker(
+            redis.StrictRedis(
+                host=app.config['REDIS_ADDRESS'][0],
+                port=app.config['REDIS_ADDRESS'][1],
+                db=args.redis_db,
+                password=app.config['REDIS_PASSWORD'],
+                decode_responses=True
+            ),
+            args.task_time
+        )
+        worker.start()
+        workers.append(worker)
+
+    try:
+
+        # Build the requests
+        if args.replay:
+            with open(args.replay) as f:
+                requests = get_replay_requests(json.load(f), uids, sample)
+
+        else:
+            requests = get_synthetic_requests(
+                json.loads(args.mix) if args.mix else DEFAULT_MIX,
+                args.requests,
+                uids,
+                sample
+            )
+
+        # Run the benchmark
+        started = time.perf_counter()
+        results = asyncio.get_event_loop().run_until_complete(
+            run(
+                app,
+                args.port,
+                account.api_key,
+                requests,
+                args.concurrency
+            )
+        )
+        wall_time = time.perf_counter() - started
+
+        print(json.dumps(summarize(results, wall_time), indent=4))
+
+    finally:
+        for worker in workers:
+            worker.stop()
+
+        clean_up(account, files_path)
@@ -0,0 +1,337 @@
+"""
+Benchmark transform chains against a corpus of sample images.
+
+Each image in the corpus is run through each chain in the matrix using the
+real transform classes, however, variations are not stored (no database or
+backend is required). For each run the time spent in each stage (decoding,
+each transform and encoding), the peak RSS, and the length of the output are
+reported as JSON, along with a per chain summary.
+
+The matrix is a JSON file using the same structure as the variations
+argument for the API, for example:
+
+    {
+        "thumb": [
+            ["fit", {"width": 200, "height": 200}],
+            ["output", {"image_format": "JPEG", "quality": 75}]
+        ]
+    }
+
+Usage:
+
+    python -m benchmarks.transforms path/to/corpus -m matrix.json
+"""
+
+import argparse
+from collections import defaultdict
+import json
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from flask import Config
+
+from blueprints.assets.models import Asset
+from transforms import get_transform
+from transforms.images import Frames
+
+__all__ = ['run']
+
+
+# Constants
+
+DEFAULT_MATRIX = {
+    'fit-jpeg': [
+        ['fit', {'width': 800, 'height': 800}],
+        ['output', {'image_format': 'JPEG'}]
+    ],
+    'fit-webp': [
+        ['fit', {'width': 800, 'height': 800}],
+        ['output', {'image_format': 'WebP'}]
+    ],
+    'crop-fit-png': [
+        ['crop', {'top': 0.1, 'left': 0.1, 'bottom': 0.9, 'right': 0.9}],
+        ['fit', {'width': 400, 'height': 400}],
+        ['output', {'image_format': 'PNG'}]
+    ]
+}
+
+IMAGE_EXTS = {'bmp', 'gif', 'jpeg', 'jpg', 'png', 'tif', 'tiff', 'webp'}
+
+
+# Classes
+
+class TimedFrames(Frames):
+    """
+    A sequence of frames that records the time spent decoding frames and
+    applying each operation.
+
+    As frames are transformed lazily (typically as the final transform
+    encodes them) timing the calls to each transform isn't enough to
+    attribute time to each stage.
+    """
+
+    # The table of timings (`{stage: seconds}`) for the current run
+    timings = None
+
+    # The name of the stage (transform) currently queueing operations
+    stage = None
+
+    def map(self, op):
+        return super().map(self._timed(self.stage, op))
+
+    def _apply(self, image):
+
+        started = time.perf_counter()
+        image.load()
+        frame = image.copy()
+        self.timings['decode'] += time.perf_counter() - started
+
+        for op in self._ops:
+            frame = op(frame)
+
+        return frame
+
+    @classmethod
+    def _timed(cls, stage, op):
+        """Wrap the given operation so that time spent in it is recorded"""
+
+        def timed_op(frame):
+            started = time.perf_counter()
+            try:
+                return op(frame)
+            finally:
+                cls.timings[stage] += time.perf_counter() - started
+
+        return timed_op
+
+
+# Functions
+
+def get_peak_rss():
+    """Return the peak RSS for the current process in bytes"""
+
+    # `ru_maxrss` is reported in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        peak_rss *= 1024
+
+    return peak_rss
+
+def run(config, path, chain_name, chain):
+    """
+    Run the given chain of transforms against the image at the given path and
+    return the timings and output for the run.
+    """
+
+    with open(path, 'rb') as f:
+        file = f.read()
+
+    rss_before = get_peak_rss()
+
+    timings = defaultdict(float)
+    TimedFrames.timings = timings
+
+    # Build the initial frames (applying the same memory guard transforms
+    # would).
+    frames = TimedFrames(file)
+    if config.get('IMAGE_MAX_FRAME_LENGTH'):
+        frames = frames.reduce(config['IMAGE_MAX_FRAME_LENGTH'])
+
+    asset = Asset(
+        name=os.path.basename(path),
+        meta={'image': {}},
+        type='image'
+    )
+    output = {}
+
+    def store_variation(config, asset, name, versioned, ext, meta, file):
+        output['meta'] = meta
+
+    started = time.perf_counter()
+
+    history = []
+    for name, settings in chain:
+        transform = get_transform('image', name)(**settings)
+
+        # Capture the output of final transforms instead of storing it
+        transform._store_variation = store_variation
+
+        TimedFrames.stage = name
+        stage_started = time.perf_counter()
+        queued = sum(timings.values())
+
+        frames = transform.transform(
+            config,
+            asset,
+            file,
+            chain_name,
+            frames,
+            history
+        )
+        history.append(transform)
+
+        # Any time spent in the transform call that wasn't spent decoding or
+        # applying queued operations is attributed to the transform itself
+        # (for the final transform this is the time spent encoding).
+        elapsed = time.perf_counter() - stage_started
+        timings[name] += elapsed - (sum(timings.values()) - queued)
+
+    wall_time = time.perf_counter() - started
+
+    peak_rss = get_peak_rss()
+
+    return {
+        'image': os.path.basename(path),
+        'chain': chain_name,
+        'stages': dict(timings),
+        'wall_time': wall_time,
+        'peak_rss': peak_rss,
+        'peak_rss_increase': peak_rss - rss_before,
+        'length': output.get('meta', {}).get('length'),
+        'size': output.get('meta', {}).get('image', {}).get('size')
+    }
+
+def run_isolated(args):
+    """
+    Run a benchmark (see `run`), this function is called in a fresh process
+    for each run so the peak RSS reported applies to the run only.
+    """
+    return run(*args)
+
+def get_corpus(corpus_path):
+    """Return a sorted list of image paths within the corpus directory"""
+    return sorted([
+        os.path.join(corpus_path, filename)
+        for filename in os.listdir(corpus_path)
+        if filename.rsplit('.', 1)[-1].lower() in IMAGE_EXTS
+    ])
+
+def summarize(results):
+    """Return a summary of the results for each chain"""
+
+    summary = {}
+    for result in results:
+
+        chain_summary = summary.setdefault(
+            result['chain'],
+            {
+                'images': 0,
+                'wall_time': 0,
+                'length': 0,
+                'peak_rss': 0,
+                'stages': defaultdict(float)
+            }
+        )
+
+        chain_summary['images'] += 1
+        chain_summary['wall_time'] += result['wall_time']
+        chain_summary['length'] += result['length'] or 0
+        chain_summary['peak_rss'] = max(
+            chain_summary['peak_rss'],
+            result['peak_rss']
+        )
+
+        for stage, seconds in result['stages'].items():
+            chain_summary['stages'][stage] += seconds
+
+    for chain_summary in summary.values():
+        chain_summary['images_per_second'] = (
+            chain_summary['images'] / chain_summary['wall_time']
+            if chain_summary['wall_time'] else None
+        )
+
+    return summary
+
+
+# Main
+
+if __name__ == '__main__':
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Benchmark transforms')
+    parser.add_argument(
+        'corpus',
+        help='A directory of sample images'
+    )
+    parser.add_argument(
+        '-e',
+        '--env',
+        choices=['staging', 'local', 'production', 'test'],
+        default=None,
+        dest='env',
+        help='The worker settings to use (defaults to the default settings)',
+        required=False
+    )
+    parser.add_argument(
+        '-m',
+        '--matrix',
+        default=None,
+        dest='matrix',
+        help='A JSON file describing the chains of transforms to run',
+        required=False
+    )
+    parser.add_argument(
+        '-r',
+        '--repeat',
+        default=1,
+        dest='repeat',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-o',
+        '--output',
+        default=None,
+        dest='output',
+        help='A file to write the report to (defaults to stdout)',
+        required=False
+    )
+    args = parser.parse_args()
+
+    # Load settings
+    config = Config(os.path.dirname(os.path.realpath(__file__)))
+    if args.env:
+        config.from_object(f'settings.workers.{args.env}.Config')
+    else:
+        config.from_object('settings.workers.DefaultConfig')
+
+    # Load the matrix of chains
+    matrix = DEFAULT_MATRIX
+    if args.matrix:
+        with open(args.matrix) as f:
+            matrix = json.load(f)
+
+    for chain_name, chain in matrix.items():
+        for name, settings in chain:
+            assert get_transform('image', name), \
+                    f'Unknown transform: image:{name} ({chain_name})'
+
+    # Run the benchmarks (each in a fresh process)
+    jobs = [
+        (dict(config), path, chain_name, chain)
+        for path in get_corpus(args.corpus)
+        for chain_name, chain in matrix.items()
+        for _ in range(args.repeat)
+    ]
+
+    with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+        results = pool.map(run_isolated, jobs, chunksize=1)
+
+    report = json.dumps(
+        {
+            'corpus': os.path.abspath(args.corpus),
+            'repeat': args.repeat,
+            'results': results,
+            'summary': summarize(results)
+        },
+        indent=4
+    )
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    else:
+        print(report)
@@ -1,10 +1,16 @@
 from datetime import datetime, timedelta
 import json
 
+from bson.objectid import ObjectId
+import click
 from flask import Flask, current_app
 from flask.cli import AppGroup
+from mongoframes import And, In, Q, SortBy
+from pymongo.errors import DuplicateKeyError
 
-from blueprints.accounts.models import Account
+from backends.local import LocalBackend
+from blueprints.accounts.models import Account, Stats
+from blueprints.assets.models import Asset, Variation
 
 __all__ = ['add_commands']
 
@@ -44,3 +50,175 @@ def trim_api_logs():
                 if called <= trim_after:
                     current_app.redis.ltrim(key, 0, i - 1)
                     break
+
+@accounts_cli.command('migrate-stats')
+def migrate_stats():
+    """
+    Migrate stats from the legacy layout (a single document per scope holding
+    every day, month and year value) into monthly buckets.
+
+    Legacy values are added to any values already recorded in the buckets
+    (e.g stats recorded since the new layout was deployed), and each bucket
+    is flagged once migrated so the migration can safely be rerun if
+    interrupted.
+    """
+
+    legacy_collection = Stats.get_db()['Stats']
+    collection = Stats.get_collection()
+
+    for legacy_stats in legacy_collection.find():
+
+        buckets = {}
+        for date_str, values in legacy_stats.get('values', {}).items():
+
+            if len(date_str) == 7:
+                # Month totals
+                month = date_str
+                bucket = buckets.setdefault(month, {'days': {}, 'totals': {}})
+                bucket['totals'].update(values)
+
+            elif len(date_str) == 10:
+                # Daily values
+                month, day = date_str[:7], int(date_str[8:])
+                bucket = buckets.setdefault(month, {'days': {}, 'totals': {}})
+                for stat, value in values.items():
+                    days = bucket['days'].setdefault(stat, [0] * 31)
+                    days[day - 1] = value
+
+        migrated = 0
+        for month, bucket in buckets.items():
+
+            # Merge the legacy values into the bucket (see `Stats.inc`)
+            values = {'migrated': True}
+            for stat, days in bucket['days'].items():
+                values[f'days.{stat}'] = {
+                    '$map': {
+                        'input': {'$range': [0, 31]},
+                        'as': 'day',
+                        'in': {
+                            '$add': [
+                                {
+                                    '$ifNull': [
+                                        {
+                                            '$arrayElemAt': [
+                                                f'$days.{stat}',
+                                                '$$day'
+                                            ]
+                                        },
+                                        0
+                                    ]
+                                },
+                                {'$arrayElemAt': [days, '$$day']}
+                            ]
+                        }
+                    }
+                }
+
+            for stat, total in bucket['totals'].items():
+                values[f'totals.{stat}'] = {
+                    '$add': [{'$ifNull': [f'$totals.{stat}', 0]}, total]
+                }
+
+            # Buckets already migrated don't match the filter, the upsert
+            # then conflicts with the existing bucket and it's skipped.
+            try:
+                collection.update_one(
+                    {
+                        'scope': legacy_stats['scope'],
+                        'month': month,
+                        'migrated': {'$ne': True}
+                    },
+                    [{'$set': values}],
+                    upsert=True
+                )
+
+            except DuplicateKeyError:
+                continue
+
+            migrated += 1
+
+        click.echo(
+            f'{legacy_stats["scope"]}: {migrated} of {len(buckets)} buckets '
+            'migrated'
+        )
+
+@accounts_cli.command('shard-local-backends')
+@click.argument('account_ids', nargs=-1)
+def shard_local_backends(account_ids):
+    """
+    Move the files for accounts using a sharded local backend into their
+    shards (by default all accounts are migrated).
+
+    The migration can be run whilst the API is in use as sharded local
+    backends fall back to unsharded paths for files not yet moved. Enable
+    the sharded option in the account's backend settings before running
+    the migration.
+    """
+
+    batch_size = 1000
+
+    accounts = Account.many(
+        In(Q._id, [ObjectId(id) for id in account_ids]) if account_ids
+        else None,
+        projection={
+            'name': True,
+            'public_backend_settings': True,
+            'secure_backend_settings': True
+        }
+    )
+
+    for account in accounts:
+        for secure in [False, True]:
+
+            if secure:
+                backend = account.secure_backend
+            else:
+                backend = account.public_backend
+
+            if not (isinstance(backend, LocalBackend) and backend.sharded):
+                continue
+
+            moved = 0
+            last_id = None
+
+            while True:
+
+                # Fetch the next batch of assets stored by the backend
+                query = [
+                    Q.account == account,
+                    Q.secure == True if secure else Q.secure != True
+                ]
+
+                if last_id:
+                    query.append(Q._id > last_id)
+
+                assets = Asset.many(
+                    And(*query),
+                    projection={
+                        'ext': True,
+                        'name': True,
+                        'uid': True,
+                        'variations': {'$sub.': Variation}
+                    },
+                    sort=SortBy(Q._id),
+                    limit=batch_size
+                )
+
+                if not assets:
+                    break
+
+                for asset in assets:
+
+                    moved += backend.shard(asset.store_key)
+
+                    for name, variation in (asset.variations or {}).items():
+                        moved += backend.shard(
+                            variation.get_store_key(asset, name)
+                        )
+
+                last_id = assets[-1]._id
+
+            click.echo(
+                f'{account.name} ({"secure" if secure else "public"}): '
+                f'{moved} files moved'
+            )
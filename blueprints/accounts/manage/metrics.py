@@ -0,0 +1,167 @@
+"""
+Activity metrics (API calls, assets, storage and variations over a period)
+for the dashboard and account activity views.
+
+Metrics are cached in redis per scope and period. A period is split into its
+history (every unit before the current one, which can no longer change) and
+the current unit (e.g today), the history is cached until the period moves on
+and only the current unit is recomputed when the (short lived) cache of it
+expires.
+"""
+
+import datetime
+import json
+
+from flask import current_app
+from manhattan.utils.chrono import today_tz
+from mongoframes.queries import to_refs
+
+from blueprints.accounts.models import Stats
+
+__all__ = [
+    'get_activity',
+    'get_chart_data',
+    'get_period'
+]
+
+
+# Constants
+
+# The periods metrics can be viewed for `{period: (unit, length)}`
+PERIODS = {
+    '90d': ('days', 90),
+    '12m': ('months', 12),
+    '10y': ('years', 10)
+}
+
+# The default period metrics are viewed for
+DEFAULT_PERIOD = '90d'
+
+# The stats included in the metrics
+STATS = ['api_calls', 'assets', 'length', 'variations']
+
+
+# Functions
+
+def get_activity(scope, period):
+    """
+    Return the activity for the given scope (an account or 'all') and period
+    as a dictionary `{'labels': [...], 'series': {stat: [...]}, 'totals':
+    {stat: total}}`, or `None` if no stats have been recorded for the scope.
+    """
+
+    unit, length = PERIODS[period]
+    today = today_tz()
+    conn = current_app.redis
+    key_prefix = f'h51_activity:{to_refs(scope)}:{period}:{today}'
+
+    # The current unit
+    current = _cache(
+        conn,
+        f'{key_prefix}:current',
+        current_app.config['ACTIVITY_CACHE_LIFESPAN'],
+        lambda: _get_current(scope, today, unit)
+    )
+
+    if not current['has_stats']:
+        return None
+
+    # The history (the cache key includes today's date and so the history is
+    # recomputed when the period moves on).
+    history = _cache(
+        conn,
+        f'{key_prefix}:history',
+        60 * 60 * 24,
+        lambda: _get_history(scope, today, unit, length)
+    )
+
+    labels = history['labels'] + current['labels']
+    series = {s: history['series'][s] + current['series'][s] for s in STATS}
+
+    return {
+        'labels': labels,
+        'series': series,
+        'totals': {s: sum(v) for s, v in series.items()}
+    }
+
+def get_chart_data(activity):
+    """Return the chart data for the given activity"""
+
+    color = {
+        'backgroundColor': '#67B3DA64',
+        'borderColor': '#67B3DA',
+        'pointBackgroundColor': '#67B3DA64',
+        'pointBorderColor': '#67B3DA'
+    }
+
+    series = dict(activity['series'])
+
+    # Storage is charted in MB
+    series['length'] = [round(v / 1000000, 2) for v in series['length']]
+
+    return {
+        stat: {
+            'datasets': [{
+                'data': series[stat],
+                **color
+            }],
+            'labels': activity['labels']
+        }
+        for stat in STATS
+    }
+
+def get_period(period):
+    """Return the given period if valid or the default period"""
+    return period if period in PERIODS else DEFAULT_PERIOD
+
+def _cache(conn, key, lifespan, func):
+    """
+    Return the cached value for the given key, if there's no cached value
+    then the value returned by `func` is cached and returned.
+    """
+
+    value = conn.get(key)
+    if value:
+        return json.loads(value)
+
+    value = func()
+    conn.set(key, json.dumps(value), ex=lifespan)
+
+    return value
+
+def _get_current(scope, date, unit):
+    """Return the activity for the current unit (e.g today)"""
+
+    has_stats = Stats.has_stats(scope)
+    labels, series = [], {s: [] for s in STATS}
+
+    if has_stats:
+        labels, series = Stats.get_series(scope, date, unit, 1, STATS)
+
+    return {
+        'has_stats': has_stats,
+        'labels': labels,
+        'series': series
+    }
+
+def _get_history(scope, date, unit, length):
+    """
+    Return the activity for the units in the period before the current unit.
+    """
+
+    # Find the last date in the previous unit
+    if unit == 'days':
+        date -= datetime.timedelta(days=1)
+
+    elif unit == 'months':
+        date = date.replace(day=1) - datetime.timedelta(days=1)
+
+    elif unit == 'years':
+        date = date.replace(month=1, day=1) - datetime.timedelta(days=1)
+
+    labels, series = Stats.get_series(scope, date, unit, length - 1, STATS)
+
+    return {
+        'labels': labels,
+        'series': series
+    }
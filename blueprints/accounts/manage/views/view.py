@@ -4,7 +4,6 @@ View an account.
 
 from manhattan.manage.views import generic
 from manhattan.utils.chrono import today_tz
-from mongoframes import Q
 
 from blueprints.accounts.manage.config import AccountConfig
 from blueprints.accounts.models import Stats
@@ -22,26 +21,22 @@ view_chains['get'].insert_link('get_document', 'get_highlights', after=True)
 def get_highlights(state):
 
     # Get the stats for the account
-    api_call_keys = Stats.get_key_range(today_tz(), 'days', 7, 'api_calls')
-
-    state.has_stats = False
-    stats = Stats.one(
-        Q.scope == state.account,
-        projection={
-            'values.all.assets': True,
-            'values.all.length': True,
-            'values.all.variations': True,
-            **{f'values.{k}': True for k in api_call_keys}
-        }
-    )
+    state.has_stats = Stats.has_stats(state.account)
+    if state.has_stats:
+        labels, series = Stats.get_series(
+            state.account,
+            today_tz(),
+            'days',
+            7,
+            ['api_calls']
+        )
 
-    if stats:
-        state.has_stats = True
         state.highlights = {
-            'api_calls': stats.sum_stats(api_call_keys),
-            'assets': stats.get_stat('all.assets'),
-            'length': stats.get_stat('all.length'),
-            'variations': stats.get_stat('all.variations')
+            'api_calls': sum(series['api_calls']),
+            **Stats.get_totals(
+                state.account,
+                ['assets', 'length', 'variations']
+            )
         }
 
 
@@ -2,8 +2,9 @@
 import datetime
 
 from manhattan.comparable import ComparableFrame
-from mongoframes import ASC, Frame, IndexModel, Q
+from mongoframes import And, ASC, Frame, In, IndexModel, Q
 from mongoframes.queries import to_refs
+from pymongo import WriteConcern
 
 from backends import get_backend
 
@@ -107,130 +108,231 @@ Account.listen('insert', Account._on_insert)
 class Stats(Frame):
     """
     A collection that holds stats about account usage.
+
+    Stats are stored as time-series buckets, one document per scope per
+    month. Each bucket holds the daily values for each stat as a fixed
+    length array (indexed by the day of the month) along with the month's
+    totals, so the size of a bucket (and the cost of updating it) is
+    constant. Monthly, yearly and all time figures are rolled up from the
+    month totals by the database.
     """
 
+    _collection = 'StatsBuckets'
+
     _fields = {
 
         # The scope of the stat (for example all or an account Id)
         'scope',
 
-        # A dictionary holding
-        'values',
+        # The month the bucket holds stats for (`YYYY-MM`)
+        'month',
+
+        # A dictionary of daily values `{stat: [day1, day2, ..., day31]}`
+        'days',
+
+        # A dictionary of the totals for the month `{stat: total}`
+        'totals',
+
+        # Flag indicating legacy stats have been merged into the bucket (see
+        # the `accounts migrate-stats` command).
+        'migrated'
     }
 
     _indexes = [
-        IndexModel([('scope', ASC)], unique=True)
+        IndexModel([('scope', ASC), ('month', ASC)], unique=True)
     ]
 
     def __str__(self):
-        return self.scope
-
-    def get_series_labels(self, keys):
-        """Return a list of labels for a data series for the given keys"""
-        labels = []
-        date_str_len = len(keys[0].split('.', 1)[0])
-
-        for key in reversed(keys):
-            date_str = key[:date_str_len]
-
-            if date_str_len == 4:
-                labels.append(date_str)
-
-            elif len(date_str) == 7:
-                date = datetime.datetime.strptime(f'{date_str}-01', '%Y-%m-%d')
-                labels.append(date.strftime('%b, %y'))
-
-            elif len(date_str) == 10:
-                date = datetime.datetime.strptime(date_str, '%Y-%m-%d')
-                labels.append(date.strftime('%-d %b'))
-
-        return labels
-
-    def get_series(self, keys):
-        """Return a data series for the given keys"""
-        return list(reversed([self.get_stat(k) for k in keys]))
-
-    def get_stat(self, key):
-        """Return the given stat from values or 0 if the stat does not exist"""
-        values = self.values
-        for k in key.split('.'):
-            if k in values:
-                values = values[k]
-            else:
-                return 0
-
-        return values
-
-    def sum_stats(self, keys):
-        """Return the sum of the given keys"""
-        return sum(self.get_series(keys))
+        return f'{self.scope} ({self.month})'
 
     @classmethod
-    def get_key_range(cls, date, unit, length, stat):
+    def get_series(cls, scope, date, unit, length, stats):
         """
-        Return a list of keys for the specified unit (days, months, years),
-        length, and stat starting from the given date.
+        Return a list of labels and a table of data series `{stat: [...]}`
+        for the specified unit (days, months, years), length, and stats
+        ending at the given date (series are in date order).
         """
 
-        keys = []
-
-        year = date.year
-        month = date.month
+        scope = to_refs(scope)
 
         if unit == 'days':
-            while length > 0:
-                keys.append(f'{date}.{stat}')
-                date -= datetime.timedelta(days=1)
-                length -= 1
+            dates = [
+                date - datetime.timedelta(days=i)
+                for i in range(length - 1, -1, -1)
+            ]
+            months = sorted(set(str(d)[:7] for d in dates))
+
+            buckets = cls.many(
+                And(Q.scope == scope, In(Q.month, months)),
+                projection={
+                    'month': True,
+                    **{f'days.{stat}': True for stat in stats}
+                }
+            )
+            days = {b.month: b.days or {} for b in buckets}
 
-        elif unit == 'months':
-            while length > 0:
-                keys.append(f'{year}-{str(month).zfill(2)}.{stat}')
+            labels = [d.strftime('%-d %b') for d in dates]
+            series = {stat: [] for stat in stats}
+            for d in dates:
+                bucket_days = days.get(str(d)[:7], {})
+                for stat in stats:
+                    values = bucket_days.get(stat)
+                    series[stat].append(values[d.day - 1] if values else 0)
 
-                month -= 1
-                if month < 1:
-                    month = 12
-                    year -= 1
+        elif unit == 'months':
+            months = cls._get_months(date, length)
+
+            buckets = cls.many(
+                And(Q.scope == scope, In(Q.month, months)),
+                projection={
+                    'month': True,
+                    **{f'totals.{stat}': True for stat in stats}
+                }
+            )
+            totals = {b.month: b.totals or {} for b in buckets}
 
-                length -= 1
+            labels = [
+                datetime.datetime.strptime(m, '%Y-%m').strftime('%b, %y')
+                for m in months
+            ]
+            series = {
+                stat: [totals.get(m, {}).get(stat, 0) for m in months]
+                for stat in stats
+            }
 
         elif unit == 'years':
-            keys = [
-                f'{y}.{stat}' for y in range(year, year - length, -1)
+            years = [
+                str(y) for y in range(date.year - length + 1, date.year + 1)
             ]
 
-        return keys
+            totals = {
+                r['_id']: r for r in cls._rollup(
+                    {
+                        'scope': scope,
+                        'month': {
+                            '$gte': f'{years[0]}-01',
+                            '$lte': f'{years[-1]}-12'
+                        }
+                    },
+                    {'$substr': ['$month', 0, 4]},
+                    stats
+                )
+            }
+
+            labels = years
+            series = {
+                stat: [totals.get(y, {}).get(stat, 0) for y in years]
+                for stat in stats
+            }
+
+        return labels, series
 
     @classmethod
-    def get_inc_keys(cls, date, stat):
-        """
-        Get a list of keys that need to be used when incrementing stats for
-        the given account, date and stat.
-        """
+    def get_totals(cls, scope, stats):
+        """Return a table of all time totals `{stat: total}` for the scope"""
+
+        totals = cls._rollup({'scope': to_refs(scope)}, None, stats)
+        if not totals:
+            return {stat: 0 for stat in stats}
 
-        keys = []
-        date_str = str(date)
-        for timeframe in ['all', date_str[:4], date_str[:7], date_str]:
-            keys.append(f'{timeframe}.{stat}')
+        return {stat: totals[0][stat] for stat in stats}
 
-        return keys
+    @classmethod
+    def has_stats(cls, scope):
+        """Return True if any stats have been recorded for the scope"""
+        return cls.count(Q.scope == to_refs(scope)) > 0
 
     @classmethod
     def inc(cls, account, date, stats):
         """Increment the given stats (`{stat1: amount1, stat2: amount2}`)"""
 
-        incs = {}
+        day = date.day - 1
+
+        # The update is performed as a pipeline so that a bucket's arrays
+        # can be created (zero filled) and incremented in a single upsert.
+        #
+        # NOTE: Updates with a pipeline require MongoDB 4.2+ and pymongo
+        # 3.9+.
+        values = {}
         for stat, amount in stats.items():
-            for key in cls.get_inc_keys(date, stat):
-                incs[f'values.{key}'] = amount
+            values[f'days.{stat}'] = {
+                '$map': {
+                    'input': {'$range': [0, 31]},
+                    'as': 'day',
+                    'in': {
+                        '$add': [
+                            {
+                                '$ifNull': [
+                                    {
+                                        '$arrayElemAt': [
+                                            f'$days.{stat}',
+                                            '$$day'
+                                        ]
+                                    },
+                                    0
+                                ]
+                            },
+                            {'$cond': [{'$eq': ['$$day', day]}, amount, 0]}
+                        ]
+                    }
+                }
+            }
+            values[f'totals.{stat}'] = {
+                '$add': [{'$ifNull': [f'$totals.{stat}', 0]}, amount]
+            }
+
+        collection = cls.get_collection().with_options(
+            write_concern=WriteConcern(w=0)
+        )
 
         for scope in ['all', to_refs(account)]:
-            cls.get_collection().update(
-                (Q.scope == scope).to_dict(),
-                {
-                    '$set': {'scope': scope},
-                    '$inc': incs
-                },
-                w=0,
+            collection.update_one(
+                {'scope': scope, 'month': str(date)[:7]},
+                [{'$set': values}],
                 upsert=True
             )
+
+    @classmethod
+    def _get_months(cls, date, length):
+        """
+        Return a list of months (`YYYY-MM`) of the given length ending with
+        the month of the given date.
+        """
+
+        months = []
+
+        year = date.year
+        month = date.month
+
+        while length > 0:
+            months.insert(0, f'{year}-{str(month).zfill(2)}')
+
+            month -= 1
+            if month < 1:
+                month = 12
+                year -= 1
+
+            length -= 1
+
+        return months
+
+    @classmethod
+    def _rollup(cls, match, group_by, stats):
+        """
+        Return the sum of the month totals for the given stats for buckets
+        matching the filter, grouped by the given expression.
+        """
+        return list(
+            cls.get_collection().aggregate([
+                {'$match': match},
+                {
+                    '$group': {
+                        '_id': group_by,
+                        **{
+                            stat: {'$sum': f'$totals.{stat}'}
+                            for stat in stats
+                        }
+                    }
+                }
+            ])
+        )
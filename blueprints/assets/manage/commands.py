@@ -13,6 +13,8 @@ from swm import monitors
 
 from blueprints.accounts.models import Account, Stats
 from blueprints.assets.models import Asset, Variation
+import profiler
+from workers import counters
 from workers.tasks import AnalyzeTask, GenerateVariationTask
 from workers.workers import AssetWorker
 
@@ -40,8 +42,14 @@ def clear_tasks(force):
 
     for task in tasks:
         if force or not task.assigned_to:
+            # Release the flight for variation tasks so that requests for
+            # the same variation don't wait on the cleared task.
+            if isinstance(task, GenerateVariationTask):
+                task.release_flight(current_app.redis)
+
             current_app.redis.delete(task.id)
             current_app.redis.delete(task.lock_key)
+            counters.complete_task(current_app.redis, task)
 
 @assets_cli.command('monitor-tasks')
 def monitor_tasks():
@@ -54,32 +62,44 @@ def monitor_tasks():
     every 5 minutes) on at least two nodes.
     """
 
-    tasks = monitors.get_tasks(
+    task_counters = counters.get_counters(
         current_app.redis,
-        AnalyzeTask,
-        GenerateVariationTask
+        [AnalyzeTask, GenerateVariationTask]
     )
 
     # Check the number of incompleted tasks
-    if len(tasks) > current_app.config['WARNINGS_MAX_TASKS']:
-        logging.warning(f'High volume of tasks: {len(tasks)} tasks')
+    task_count = sum(
+        c['queued'] + c['running'] for c in task_counters['tasks'].values()
+    )
+    if task_count > current_app.config['WARNINGS_MAX_TASKS']:
+        logging.warning(f'High volume of tasks: {task_count} tasks')
         return
 
     # Check for long running tasks
-    for task in tasks:
-        age = (time.time_ns() - task.timestamp) / (10 ** 9)
-        if age > current_app.config['WARNINGS_MAX_TASK_AGE']:
-            logging.warning(f'Long running task(s): running for {age} seconds')
-            return
+    age = max(
+        [c['oldest_age'] or 0 for c in task_counters['tasks'].values()]
+    )
+    if age > current_app.config['WARNINGS_MAX_TASK_AGE']:
+        logging.warning(f'Long running task(s): running for {age} seconds')
+        return
 
     # If there are incomplete tasks check there is at least one worker running
     # to process it.
-    workers = monitors.get_workers(current_app.redis, AssetWorker)
-
-    if len(workers) == 0 and tasks:
+    if task_counters['workers'] == 0 and task_count:
         logging.warning('No workers running to process pending tasks')
         return
 
+@assets_cli.command('profile')
+@click.argument('target')
+@click.option('-w', '--window', default=60, type=int)
+def profile(target, window):
+    """
+    Request a worker (by Id) or the API processes (`api`) profile for a
+    window (in seconds). Profiles are written to the `PROFILE_PATH` directory
+    on the server the worker or API process is running on.
+    """
+    profiler.send_control_message(current_app.redis, target, window)
+
 @assets_cli.command('purge')
 def purge():
     """Purge assets that have expired"""
@@ -2,7 +2,6 @@ from datetime import datetime, timezone
 import time
 
 from mongoframes import ASC, DESC, Frame, IndexModel, SubFrame
-import numpy
 from shortuuid import ShortUUID
 
 __all__ = [
@@ -108,6 +107,9 @@ class Asset(Frame):
                 name
             )
 
+            # Execution traces are for internal use only
+            data['variations'][name].pop('trace', None)
+
         return data
 
     @classmethod
@@ -137,6 +139,11 @@ class Variation(SubFrame):
         # depending on the type of file and applied transforms).
         'meta',
 
+        # A trace of the time and resources taken by each step in generating
+        # the variation (only stored if the `ASSET_WORKER_STORE_TRACE` setting
+        # is enabled, see `workers.trace`).
+        'trace',
+
         # The variation version. Versions are used so that if a variation is
         # modified the new version will have a different store key and URL
         # which avoids issues with file caching in browsers.
@@ -166,5 +173,11 @@ class Variation(SubFrame):
 
     @classmethod
     def next_version(cls, current_version=None):
-        version = int(current_version or '000', 36)
-        return numpy.base_repr(version + 1, 36).zfill(3).lower()
+        version = int(current_version or '000', 36) + 1
+
+        digits = ''
+        while version:
+            version, digit = divmod(version, 36)
+            digits = '0123456789abcdefghijklmnopqrstuvwxyz'[digit] + digits
+
+        return digits.zfill(3)
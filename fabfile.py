@@ -587,6 +587,53 @@ def stop_api(ctx):
         for conn in settings['hosts']:
             conn.run(supervisor_api_cmd(conn, 'stop', 'api'))
 
+# -- Notification tasks --
+
+@task
+def cycle_notifications(ctx):
+    """Cycle the notification dispatcher"""
+
+    if settings['env'] == 'local':
+        raise Exit(
+            'In the local environment the notification dispatcher is run '
+            'using a daemon, to cycle the dispatcher use `Ctrl+C` and run '
+            '`fab start-notifications`.'
+        )
+
+    else:
+        for conn in settings['hosts']:
+            conn.run(supervisor_notifications_cmd(conn, 'restart'))
+
+@task
+def start_notifications(ctx):
+    """Start the notification dispatcher"""
+
+    if settings['env'] == 'local':
+        conn = settings['hosts'][0]
+        conn.local(
+            'venv/bin/python notification_dispatcher.py',
+            pty=True,
+            replace_env=False
+        )
+
+    else:
+        for conn in settings['hosts']:
+            conn.run(supervisor_notifications_cmd(conn, 'start'))
+
+@task
+def stop_notifications(ctx):
+    """Stop the notification dispatcher"""
+
+    if settings['env'] == 'local':
+        raise Exit(
+            'In the local environment the notification dispatcher is run '
+            'using a daemon, to quit the dispatcher use `Ctrl+C`.'
+        )
+
+    else:
+        for conn in settings['hosts']:
+            conn.run(supervisor_notifications_cmd(conn, 'stop'))
+
 # -- Worker tasks --
 
 @task
@@ -661,3 +708,11 @@ def supervisor_manage_cmd(conn, cmd):
 
     return f'{supervisor_path} {cmd} {supervisor_prefix}_manage'
 
+def supervisor_notifications_cmd(conn, cmd):
+    """Return the required string to call the given command"""
+
+    supervisor_path = conn.run('which supervisorctl', hide=True).stdout.strip()
+    supervisor_prefix = settings['supervisor_prefix']
+
+    return f'{supervisor_path} {cmd} {supervisor_prefix}_notifications'
+
@@ -0,0 +1,311 @@
+"""
+A minimal metrics subsystem (counters, gauges and histograms) for the API
+and workers, metrics are exported in the Prometheus text format.
+
+Metrics are held per process. The API exposes its metrics on the `/metrics`
+endpoint, workers write theirs to a file (for collection by the node
+exporter's textfile collector).
+"""
+
+import bisect
+import contextlib
+import os
+import tempfile
+import threading
+import time
+
+__all__ = [
+
+    # Classes
+    'Counter',
+    'Gauge',
+    'Histogram',
+
+    # Functions
+    'render',
+    'write_to_file'
+]
+
+
+# Classes
+
+class BaseMetric:
+    """
+    Metrics hold a value (or values) for each combination of label values
+    they're recorded against.
+    """
+
+    # The Prometheus type of the metric
+    type = ''
+
+    # A table of registered metrics `{name: metric}`
+    _metrics = {}
+
+    def __init__(self, name, description, labels=None):
+
+        assert name not in self._metrics, f'Metric already exists: {name}'
+
+        # The name of the metric
+        self.name = name
+
+        # A description of the metric
+        self.description = description
+
+        # The names of the labels the metric is recorded against
+        self.labels = tuple(labels or [])
+
+        # A table of values for the metric `{label_values: value}`
+        self._values = {}
+
+        # A lock used to guard the values (metrics are recorded from
+        # multiple threads, e.g executors).
+        self._lock = threading.Lock()
+
+        self._metrics[name] = self
+
+    def get_samples(self):
+        """
+        Return a list of samples `[(name, {label: value}, value)]` for the
+        metric.
+        """
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labels, k)), v)
+                for k, v in sorted(self._values.items())
+            ]
+
+    def _get_key(self, labels):
+        """Return the key for a set of label values"""
+        return tuple(str(labels[l]) for l in self.labels)
+
+
+class Counter(BaseMetric):
+    """
+    A counter records a value that only increases (e.g the number of requests
+    handled).
+    """
+
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        """Increment the counter"""
+
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(BaseMetric):
+    """
+    A gauge records a value that can go up and down (e.g the number of tasks
+    queued).
+    """
+
+    type = 'gauge'
+
+    def set(self, value, **labels):
+        """Set the gauge's value"""
+
+        key = self._get_key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(BaseMetric):
+    """
+    A histogram records the distribution of observed values (e.g the time
+    taken to perform a task) in a set of buckets.
+    """
+
+    type = 'histogram'
+
+    # The default upper bounds of the buckets values are counted in
+    default_buckets = (
+        0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60
+    )
+
+    def __init__(self, name, description, labels=None, buckets=None):
+        super().__init__(name, description, labels)
+
+        # The upper bounds of the buckets
+        self.buckets = tuple(sorted(buckets or self.default_buckets))
+
+    def get_samples(self):
+
+        samples = []
+
+        with self._lock:
+            for key, (counts, total) in sorted(self._values.items()):
+                labels = dict(zip(self.labels, key))
+
+                cumulative_count = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative_count += count
+                    samples.append((
+                        f'{self.name}_bucket',
+                        {**labels, 'le': str(bound)},
+                        cumulative_count
+                    ))
+
+                samples.append((f'{self.name}_count', labels, sum(counts)))
+                samples.append((f'{self.name}_sum', labels, total))
+
+        return samples
+
+    def observe(self, value, **labels):
+        """Observe a value"""
+
+        key = self._get_key(labels)
+        with self._lock:
+            if key not in self._values:
+                self._values[key] = ([0] * (len(self.buckets) + 1), 0)
+
+            counts, total = self._values[key]
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextlib.contextmanager
+    def time(self, **labels):
+        """Observe the time (in seconds) taken to run a block of code"""
+
+        started = time.perf_counter()
+        try:
+            yield
+
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+
+# Functions
+
+def render(labels=None):
+    """
+    Return all metrics in the Prometheus text format, optionally a set of
+    labels to add to every sample (e.g a worker Id) can be specified.
+    """
+
+    lines = []
+    for name, metric in sorted(BaseMetric._metrics.items()):
+
+        samples = metric.get_samples()
+        if not samples:
+            continue
+
+        lines.append(f'# HELP {name} {metric.description}')
+        lines.append(f'# TYPE {name} {metric.type}')
+
+        for sample_name, sample_labels, value in samples:
+            sample_labels = {**(labels or {}), **sample_labels}
+
+            if sample_labels:
+                label_str = ','.join(
+                    f'{k}="{_escape(v)}"' for k, v in sample_labels.items()
+                )
+                sample_name = f'{sample_name}{{{label_str}}}'
+
+            lines.append(f'{sample_name} {value}')
+
+    return '\n'.join(lines) + '\n'
+
+def write_to_file(path, labels=None):
+    """
+    Write all metrics to a file in the Prometheus text format, the file is
+    written atomically so collectors never read a partial file.
+    """
+
+    dirname, filename = os.path.split(path)
+    fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', dir=dirname)
+    try:
+        # Temporary files are only readable by their owner, the file must be
+        # readable by the collector (e.g node_exporter).
+        os.fchmod(fd, 0o644)
+
+        with os.fdopen(fd, 'w') as f:
+            f.write(render(labels))
+
+        os.replace(tmp_path, path)
+
+    except:
+        os.remove(tmp_path)
+        raise
+
+def _escape(value):
+    """Escape a label value"""
+    return str(value)\
+        .replace('\\', '\\\\')\
+        .replace('\n', '\\n')\
+        .replace('"', '\\"')
+
+
+# Metrics
+
+# API
+
+API_PHASE_SECONDS = Histogram(
+    'h51_api_phase_seconds',
+    'Time spent in each phase of handling API requests.',
+    ['phase']
+)
+
+API_REQUEST_SECONDS = Histogram(
+    'h51_api_request_seconds',
+    'Time taken to handle API requests.',
+    ['handler', 'method']
+)
+
+API_REQUESTS = Counter(
+    'h51_api_requests_total',
+    'API requests handled.',
+    ['handler', 'method', 'status']
+)
+
+# Caches
+
+CACHE_REQUESTS = Counter(
+    'h51_cache_requests_total',
+    'Cache lookups by result (hit or miss).',
+    ['cache', 'result']
+)
+
+# Tasks and workers
+
+TASK_PHASE_SECONDS = Histogram(
+    'h51_task_phase_seconds',
+    'Time spent in each phase of performing tasks.',
+    ['phase', 'name']
+)
+
+TASK_SECONDS = Histogram(
+    'h51_task_seconds',
+    'Time taken to perform tasks.',
+    ['task', 'result']
+)
+
+TASKS_FAILED = Gauge(
+    'h51_tasks_failed',
+    'Tasks that have failed.',
+    ['task']
+)
+
+TASKS_OLDEST_AGE_SECONDS = Gauge(
+    'h51_tasks_oldest_age_seconds',
+    'Age of the oldest incomplete task.',
+    ['task']
+)
+
+TASKS_QUEUED = Gauge(
+    'h51_tasks_queued',
+    'Tasks waiting to be performed.',
+    ['task']
+)
+
+TASKS_RUNNING = Gauge(
+    'h51_tasks_running',
+    'Tasks being performed.',
+    ['task']
+)
+
+WORKERS = Gauge(
+    'h51_workers',
+    'Active workers.'
+)
@@ -0,0 +1,21 @@
+import argparse
+
+from workers.notifications import NotificationDispatcher
+
+
+if __name__ == '__main__':
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Notification dispatcher')
+    parser.add_argument(
+        '-e',
+        '--env',
+        choices=['staging', 'local', 'production', 'test'],
+        default='local',
+        dest='env',
+        required=False
+    )
+    args = parser.parse_args()
+
+    dispatcher = NotificationDispatcher(args.env)
+    dispatcher.start()
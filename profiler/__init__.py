@@ -0,0 +1,218 @@
+"""
+A sampling profiler for the API and workers.
+
+The profiler periodically captures the stack of a process's main thread and
+writes the samples, for a window of time, to a file in the collapsed (folded)
+stack format used by flamegraph tools (e.g `flamegraph.pl`, speedscope).
+
+Samples can be tagged (e.g with the type of task and the name of the
+transform being performed), tags are added as the root frames of the sampled
+stacks so that the flamegraph can be split by tag.
+
+Profiling is either enabled for the lifetime of the process (see the
+`PROFILE` setting) or for a single window by a control message sent through
+redis (see `send_control_message`).
+"""
+
+import collections
+import contextlib
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+__all__ = [
+
+    # Classes
+    'SamplingProfiler',
+
+    # Functions
+    'get_control_key',
+    'get_control_message',
+    'send_control_message'
+]
+
+
+# Classes
+
+class SamplingProfiler:
+    """
+    A sampling profiler for a single thread (by default the thread the
+    profiler is created in).
+    """
+
+    def __init__(self, path, name, interval=0.01, thread_id=None):
+
+        # The directory profiles are written to
+        self.path = path
+
+        # A name for the profiled process (used to name profile files)
+        self.name = name
+
+        # The interval (in seconds) between samples
+        self.interval = interval
+
+        # The Id of the thread being profiled
+        self.thread_id = thread_id or threading.get_ident()
+
+        # The tags applied to samples as root frames (e.g `task:...`)
+        self._tags = ()
+
+        # The sampled stacks for the current window `{stack: count}`
+        self._samples = collections.Counter()
+
+        # The thread the profiler samples from, and an event used to stop it
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    @property
+    def running(self):
+        return bool(self._thread and self._thread.is_alive())
+
+    def start(self, window, repeat=False):
+        """
+        Start profiling for a window (in seconds), at the end of the window
+        the samples are written to a file. If `repeat` is `True` the profiler
+        continues profiling in windows until stopped.
+        """
+
+        if self.running:
+            return
+
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run,
+            args=(window, repeat),
+            name='h51_profiler',
+            daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Stop profiling (samples for the current window are written)"""
+
+        if not self.running:
+            return
+
+        self._stop_event.set()
+        self._thread.join()
+
+    @contextlib.contextmanager
+    def tag(self, **tags):
+        """
+        Tag the samples taken whilst a block of code runs (tags are nested
+        within any existing tags).
+        """
+
+        previous_tags = self._tags
+        self._tags = previous_tags \
+                + tuple(f'{k}:{v}' for k, v in tags.items() if v)
+        try:
+            yield
+
+        finally:
+            self._tags = previous_tags
+
+    def _run(self, window, repeat):
+        """Take samples until stopped (or the window ends)"""
+
+        window_started = time.time()
+        while not self._stop_event.wait(self.interval):
+
+            self._sample()
+
+            if time.time() - window_started >= window:
+                self._write(window_started)
+                window_started = time.time()
+
+                if not repeat:
+                    return
+
+        self._write(window_started)
+
+    def _sample(self):
+        """Sample the profiled thread's stack"""
+
+        frame = sys._current_frames().get(self.thread_id)
+        if frame is None:
+            return
+
+        stack = []
+        while frame:
+            code = frame.f_code
+            stack.append(
+                f'{code.co_name} '
+                f'({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+            )
+            frame = frame.f_back
+
+        stack.extend(reversed(self._tags))
+        self._samples[';'.join(reversed(stack))] += 1
+
+    def _write(self, window_started):
+        """Write the samples for the current window to a file"""
+
+        samples = self._samples
+        self._samples = collections.Counter()
+
+        if not samples:
+            return
+
+        timestamp = time.strftime('%Y%m%dT%H%M%S', time.gmtime(window_started))
+        filename = f'{self.name.replace(":", "_")}.{timestamp}.folded'
+
+        # The file is written atomically so collectors never read a partial
+        # file.
+        fd, tmp_path = tempfile.mkstemp(prefix=f'.{filename}.', dir=self.path)
+        try:
+            # Temporary files are only readable by their owner, the file must
+            # be readable by the collector.
+            os.fchmod(fd, 0o644)
+
+            with os.fdopen(fd, 'w') as f:
+                for stack, count in samples.most_common():
+                    f.write(f'{stack} {count}\n')
+
+            os.replace(tmp_path, os.path.join(self.path, filename))
+
+        except:
+            os.remove(tmp_path)
+            raise
+
+
+# Functions
+
+def get_control_key(target):
+    """
+    Return the key control messages for the given target (e.g a worker Id or
+    `api`) are sent to.
+    """
+    return f'h51_profile:{target}'
+
+def get_control_message(conn, target):
+    """
+    Return the current control message (`{'id': ..., 'window': ...}`) for the
+    given target, or `None` if there isn't one.
+
+    Control messages are not removed when read (so that all the processes for
+    a target, e.g every API process, can receive them), callers should ignore
+    messages with an Id they have already acted on.
+    """
+
+    message = conn.get(get_control_key(target))
+    if message:
+        return json.loads(message)
+
+def send_control_message(conn, target, window):
+    """
+    Send a control message requesting the given target profiles for a window
+    (in seconds).
+    """
+    conn.setex(
+        get_control_key(target),
+        window,
+        json.dumps({'id': uuid.uuid4().hex, 'window': window})
+    )
@@ -44,6 +44,20 @@ class BaseConfig:
     DEBUG = False
     SENTRY_DSN = ''
 
+    # Profiling
+
+    # The directory sampled profiles (collapsed stack files for flamegraphs)
+    # are written to, if no path is set profiling is disabled. Processes
+    # profile for a single window when requested (see `profiler`) or, if
+    # `PROFILE` is `True`, continuously.
+    PROFILE = False
+    PROFILE_PATH = ''
+
+    # The interval (in seconds) between samples, and the length (in seconds)
+    # of each window profiled continuously.
+    PROFILE_INTERVAL = 0.01
+    PROFILE_WINDOW = 60
+
     # Warnings
     WARNINGS_MAX_TASK_AGE = 60
     WARNINGS_MAX_TASKS = 25
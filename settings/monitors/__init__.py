@@ -23,6 +23,10 @@ class DefaultConfig(BaseConfig, UserDefaultConfig):
     # Caching
     SEND_FILE_MAX_AGE_DEFAULT = 0
 
+    # The time (in seconds) the current day's/month's/year's activity
+    # metrics are cached for (see `blueprints.accounts.manage.metrics`).
+    ACTIVITY_CACHE_LIFESPAN = 60
+
     # Email
     EMAIL_BACKEND = memory
     EMAIL_BACKEND_SETTINGS = {}
@@ -12,4 +12,61 @@ class DefaultConfig(BaseConfig):
 
     MAX_VARIATIONS_PER_REQUEST = 10
 
+    # The maximum time (in seconds) requests to generate a variation will
+    # wait on an identical task already in flight, rather than adding their
+    # own task.
+    VARIATION_TASK_FLIGHT_LIFESPAN = 60 * 10
+
+    # The maximum time (in seconds) requests to generate a variation will
+    # wait for the task to complete.
+    VARIATION_TASK_WAIT_TIMEOUT = 60 * 10
+
+    # The maximum time (in seconds) a bulk job (a bulk request made with a
+    # notification URL) is tracked for, a single notification is sent when
+    # all the job's tasks are complete.
+    BULK_JOB_LIFESPAN = 60 * 60 * 24
+
     MAX_BUFFER_SIZE = 1024 * 1024 * 100
+
+    # Flag indicating if the time spent in each phase of handling a request
+    # should be reported in the response's `Server-Timing` header.
+    API_SERVER_TIMING = False
+
+    # The IP addresses allowed to read the API's metrics (`/metrics`)
+    API_METRICS_ALLOWED_IP_ADDRESSES = ['127.0.0.1']
+
+    # The directory and maximum total length (in bytes) of the local disk
+    # cache for variations rendered on request (the cache is disabled if no
+    # path is set).
+    RENDER_CACHE_PATH = ''
+    RENDER_CACHE_MAX_LENGTH = 1024 * 1024 * 1024
+
+    # The maximum number of variations rendered on request (each distinct
+    # spec is stored as a variation) that can be stored against an asset.
+    RENDER_MAX_VARIATIONS = 50
+
+    # The in-process cache for files downloaded from public assets, the
+    # maximum total length (in bytes) of the files held in memory and the
+    # maximum length of a single file that will be cached (the cache is
+    # disabled if the maximum total length is 0).
+    DOWNLOAD_CACHE_MAX_LENGTH = 1024 * 1024 * 64
+    DOWNLOAD_CACHE_MAX_FILE_LENGTH = 1024 * 1024
+
+    # An (optional) directory for a disk cache of downloaded files, shared by
+    # the API processes on a server, and the maximum total length (in bytes)
+    # of the files it holds.
+    DOWNLOAD_CACHE_PATH = ''
+    DOWNLOAD_CACHE_PATH_MAX_LENGTH = 1024 * 1024 * 1024
+
+    # The size (in bytes) of the chunks files stored on the local file system
+    # are streamed in when downloaded.
+    DOWNLOAD_CHUNK_SIZE = 1024 * 64
+
+    # If set, files stored on the local file system are served by nginx by
+    # redirecting (`X-Accel-Redirect`) to their path (relative to the root
+    # directory) under this prefix. The prefix must be configured as an
+    # internal location in nginx aliased to the root directory (see
+    # `root/nginx`), files outside the root directory are streamed by the
+    # API.
+    DOWNLOAD_ACCEL_REDIRECT_PREFIX = ''
+    DOWNLOAD_ACCEL_REDIRECT_ROOT = ''
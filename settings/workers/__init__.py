@@ -10,3 +10,70 @@ class DefaultConfig(BaseConfig):
     ASSET_WORKER_POPULATION_CONTROL = None
     ASSET_WORKER_POPULATION_SPAWNER = None
     ASSET_WORKER_SLEEP_INTERVAL = 1
+
+    # Autoscaling, if set (and no population control is set) the worker
+    # population is scaled to the task queue using a `QueueDepthControl`
+    # created with these arguments (see `workers.population`), e.g:
+    #
+    #     {
+    #         'min_population': 2,
+    #         'max_population': 32,
+    #         'max_node_population': 8,
+    #         'max_task_age': 30
+    #     }
+    #
+    # Unless a population spawner is set workers are spawned on the local
+    # node and retire after being idle for the spawned idle lifespan (in
+    # seconds).
+    ASSET_WORKER_AUTOSCALE = None
+    ASSET_WORKER_SPAWNED_IDLE_LIFESPAN = 60
+
+    # The maximum address space (in bytes) of a worker process
+    # (`RLIMIT_AS`), if a task exceeds this limit the task fails (with a
+    # `MemoryError`) rather than the worker being killed.
+    #
+    # NOTE: The limit applies to the whole process's virtual address space
+    # (not its resident memory), which includes the reserved but unused
+    # memory of thread stacks, memory mapped files and libraries (e.g numpy),
+    # and so must be set well above the memory tasks actually use. If `None`
+    # (the default) no limit is applied.
+    ASSET_WORKER_MAX_ADDRESS_SPACE = None
+
+    # The number of pending tasks a worker will download the files for in the
+    # background whilst performing its current task (0 disables prefetching).
+    ASSET_WORKER_PREFETCH_DEPTH = 2
+
+    # A directory workers write their metrics to (in the Prometheus text
+    # format, one file per worker), e.g the directory read by node exporter's
+    # textfile collector. If `None` metrics are not written.
+    ASSET_WORKER_METRICS_PATH = None
+
+    # If `True` the execution trace for each task generating a variation is
+    # stored against the variation (and can be viewed in the manage app).
+    ASSET_WORKER_STORE_TRACE = False
+
+    # Notifications
+
+    # The number of notifications a dispatcher delivers at once, and the
+    # maximum number taken from the queue together (notifications for the same
+    # URL taken together are delivered over one connection).
+    NOTIFICATION_DISPATCHER_THREADS = 16
+    NOTIFICATION_BATCH_SIZE = 100
+
+    # The timeout (in seconds) for delivering a notification
+    NOTIFICATION_TIMEOUT = 10
+
+    # The number of attempts made to deliver a notification, and the delay
+    # (in seconds) before the first retry (doubled for each retry up to the
+    # maximum delay).
+    NOTIFICATION_MAX_ATTEMPTS = 5
+    NOTIFICATION_RETRY_DELAY = 10
+    NOTIFICATION_MAX_RETRY_DELAY = 60 * 10
+
+    # Images
+
+    # The maximum memory (in bytes) a decoded image frame can require. Larger
+    # images are decoded at a reduced resolution where the image format
+    # supports it (e.g JPEG), otherwise the task fails. If `None` (the
+    # default) images are always decoded at full resolution.
+    IMAGE_MAX_FRAME_LENGTH = None
@@ -7,6 +7,7 @@ from mongoframes import Q
 
 from blueprints.accounts.models import Account, Stats
 from blueprints.assets.models import Asset, Variation
+import metrics
 
 __all__ = [
 
@@ -144,7 +145,8 @@ class BaseTransform(metaclass=BaseTransformMeta):
         # Store the new variation
         new_store_key = new_variation.get_store_key(asset, variation_name)
         file.seek(0)
-        backend.store(file, new_store_key)
+        with metrics.TASK_PHASE_SECONDS.time(phase='store', name=self.name):
+            backend.store(file, new_store_key)
 
         # Add the new variation's details to the asset's `variations` field
         asset.variations[variation_name] = new_variation
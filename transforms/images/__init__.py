@@ -4,7 +4,181 @@ from PIL import Image, ImageSequence
 
 from transforms import BaseTransform
 
-__all__ = ['BaseImageTransform']
+__all__ = [
+    'BaseImageTransform',
+    'Frames'
+]
+
+
+class Frames:
+    """
+    A lazy sequence of the frames within an image.
+
+    Frames are decoded from the source file and have any queued operations
+    applied to them one at a time as the sequence is iterated, this means no
+    more than a single frame needs to be held in memory at once regardless of
+    the number of frames in the image.
+    """
+
+    def __init__(self, file, indexes=None, ops=None, draft_size=None):
+
+        # The source file (bytes) the frames are decoded from
+        self._file = file
+
+        # A size (width, height) the decoder is asked to reduce the source
+        # image to whilst decoding (only supported by some formats, e.g.
+        # JPEG), the decoded image will be no smaller than the draft size.
+        self._draft_size = draft_size
+
+        # The indexes of the frames (within the source image) that form the
+        # sequence (if `None` all frames are included).
+        self._indexes = indexes
+
+        # A list of operations (callables that accept and return a frame)
+        # applied, in order, to each frame as it's read.
+        self._ops = list(ops or [])
+
+    def __getitem__(self, key):
+
+        if isinstance(key, slice):
+            return self.__class__(
+                self._file,
+                self.indexes[key],
+                self._ops,
+                self._draft_size
+            )
+
+        image = self._open()
+        image.seek(self.indexes[key])
+
+        return self._apply(image)
+
+    def __iter__(self):
+        for frame, info in self.iter_with_infos():
+            yield frame
+
+    def __len__(self):
+        return len(self.indexes)
+
+    @property
+    def indexes(self):
+        if self._indexes is None:
+            self._indexes = range(getattr(self._open(), 'n_frames', 1))
+        return self._indexes
+
+    def draft(self, size):
+        """
+        Return a new sequence of frames that will be decoded at a reduced
+        resolution no smaller than the given size, where the image format
+        supports it.
+
+        Drafting is only possible before any operations have been queued,
+        otherwise the sequence is returned unchanged.
+        """
+
+        if self._ops:
+            return self
+
+        if self._draft_size:
+            size = (
+                min(size[0], self._draft_size[0]),
+                min(size[1], self._draft_size[1])
+            )
+
+        return self.__class__(self._file, self._indexes, self._ops, size)
+
+    def get_frame_length(self):
+        """
+        Return an estimate of the memory (in bytes) required to hold a single
+        decoded frame, the estimate is based on the image's header and so
+        doesn't require the image to be decoded.
+        """
+        image = self._open()
+
+        # Pillow stores multi-band images using 4 bytes per pixel, and most
+        # transforms will convert single band images to RGB(A), so we assume
+        # 4 bytes per pixel.
+        return image.size[0] * image.size[1] * 4
+
+    def iter_with_infos(self):
+        """
+        Return an iterator of `(frame, info)` for each frame in the sequence.
+        The info dictionary is read from the source image once the frame has
+        been decoded (some formats, e.g WebP, only set a frame's duration
+        when it's loaded) and so the queued operations are not applied to
+        it.
+        """
+
+        indexes = self.indexes
+        if len(indexes) == 0:
+            return
+
+        last = indexes[-1]
+        for index, frame in enumerate(ImageSequence.Iterator(self._open())):
+
+            if index > last:
+                break
+
+            if index in indexes:
+                yield self._apply(frame), dict(frame.info)
+
+    def map(self, op):
+        """
+        Return a new sequence of frames with the given operation applied to
+        each frame.
+        """
+        return self.__class__(
+            self._file,
+            self._indexes,
+            self._ops + [op],
+            self._draft_size
+        )
+
+    def reduce(self, max_frame_length):
+        """
+        Return a new sequence of frames that will be decoded at a reduced
+        resolution so that each frame requires no more than the given
+        memory (in bytes), where the image format supports it.
+        """
+
+        frame_length = self.get_frame_length()
+        if frame_length <= max_frame_length:
+            return self
+
+        # Decoders reduce images by a factor (for example JPEG images can be
+        # reduced by 1/2, 1/4 or 1/8), find the smallest reduction that
+        # brings the frame within the limit.
+        image = self._open()
+
+        for scale in [2, 4, 8]:
+            if frame_length / (scale ** 2) <= max_frame_length:
+                break
+
+        return self.draft((
+            max(1, image.size[0] // scale),
+            max(1, image.size[1] // scale)
+        ))
+
+    def _apply(self, image):
+        """Return a copy of the current image frame with operations applied"""
+
+        image.load()
+
+        frame = image.copy()
+        for op in self._ops:
+            frame = op(frame)
+
+        return frame
+
+    def _open(self):
+        """Open the source file as an image"""
+
+        image = Image.open(io.BytesIO(self._file))
+
+        if self._draft_size:
+            image.draft(None, self._draft_size)
+
+        return image
 
 
 class BaseImageTransform(BaseTransform):
@@ -15,21 +189,31 @@ class BaseImageTransform(BaseTransform):
 
     asset_type = 'image'
 
-    def _get_frames(self, file, frames):
+    def _get_frames(self, config, file, frames):
         """
         Return the given frames or if frames is None use the file to create a
-        list of frames to return.
+        (lazy) sequence of frames to return.
+
+        If decoding the file would require more memory than is allowed per
+        frame (`IMAGE_MAX_FRAME_LENGTH`) the frames are decoded at a reduced
+        resolution, or if the image format doesn't support this then an error
+        is raised.
         """
 
-        if frames:
+        if frames is not None:
             return frames
 
-        image = Image.open(io.BytesIO(file))
+        frames = Frames(file)
+
+        max_frame_length = config.get('IMAGE_MAX_FRAME_LENGTH')
+        if max_frame_length:
+            frames = frames.reduce(max_frame_length)
 
-        frames = []
-        for frame in range(getattr(image, 'n_frames', 1)):
-            image.seek(frame)
-            image.load()
-            frames.append(image.copy())
+            if frames.get_frame_length() > max_frame_length:
+                raise ValueError(
+                    'Image is too large to transform, decoding a frame would '
+                    f'require {frames.get_frame_length()} bytes (the limit '
+                    f'is {max_frame_length} bytes).'
+                )
 
         return frames
@@ -1,3 +1,4 @@
+import functools
 import io
 
 from manhattan.forms import BaseForm, fields, validators
@@ -37,7 +38,7 @@ class AutoOrientTransform(BaseImageTransform):
     name = 'auto_orient'
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
+        frames = self._get_frames(config, file, frames)
 
         # Exif data must be extracted from the source image
         image = Image.open(io.BytesIO(file))
@@ -64,12 +65,18 @@ class AutoOrientTransform(BaseImageTransform):
         if transforms:
 
             # Transform the frames of the image to orient it
-            for i, frame in enumerate(frames):
-                for transform in transforms:
-                    frames[i] = frame.transpose(transform)
+            frames = frames.map(
+                functools.partial(self._orient_frame, transforms)
+            )
 
         return frames
 
+    def _orient_frame(self, transforms, frame):
+        """Apply the given orientation transforms to a frame"""
+        for transform in transforms:
+            frame = frame.transpose(transform)
+        return frame
+
     @classmethod
     def get_settings_form_cls(cls):
         return SettingsForm
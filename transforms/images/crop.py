@@ -47,17 +47,17 @@ class CropTransform(BaseImageTransform):
         self.right = right
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
-
-        for i, frame in enumerate(frames):
-            frames[i] = frame.crop([
-                int(self.left * frame.size[0]),
-                int(self.top * frame.size[1]),
-                int(self.right * frame.size[0]),
-                int(self.bottom * frame.size[1])
-            ])
-
-        return frames
+        frames = self._get_frames(config, file, frames)
+        return frames.map(self._crop_frame)
+
+    def _crop_frame(self, frame):
+        """Crop a frame"""
+        return frame.crop([
+            int(self.left * frame.size[0]),
+            int(self.top * frame.size[1]),
+            int(self.right * frame.size[0]),
+            int(self.bottom * frame.size[1])
+        ])
 
     @classmethod
     def get_settings_form_cls(cls):
@@ -45,35 +45,44 @@ class FitTransform(BaseImageTransform):
         self.resample = resample
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
+        frames = self._get_frames(config, file, frames)
 
-        for i, frame in enumerate(frames):
+        if self.width and self.height:
 
-            resample = self.resample
-            if not resample:
+            # Where the image format supports it, decode the image at a
+            # reduced resolution (no smaller than twice the size we're
+            # fitting to), this is the reduction `thumbnail` applies to
+            # images that have not yet been loaded.
+            frames = frames.draft((self.width * 2, self.height * 2))
 
-                # Set the default value for resample based on the frame's
-                # color mode.
-                resample = 'NEAREST' if frame.mode == 'P' else 'LANCZOS'
+        return frames.map(self._fit_frame)
 
-            if frame.mode == 'P' and resample != 'NEAREST':
+    def _fit_frame(self, frame):
+        """Fit a frame"""
 
-                # Convert the frame to a color mode suitable for the
-                # specified resample filter.
-                if 'transparency' in frame.info:
-                    frame = frame.convert('RGBA')
-                else:
-                    frame = frame.convert('RGB')
+        resample = self.resample
+        if not resample:
 
-            # Fit the frame
-            frame.thumbnail(
-                [self.width, self.height],
-                getattr(Image, resample)
-            )
+            # Set the default value for resample based on the frame's
+            # color mode.
+            resample = 'NEAREST' if frame.mode == 'P' else 'LANCZOS'
 
-            frames[i] = frame
+        if frame.mode == 'P' and resample != 'NEAREST':
 
-        return frames
+            # Convert the frame to a color mode suitable for the
+            # specified resample filter.
+            if 'transparency' in frame.info:
+                frame = frame.convert('RGBA')
+            else:
+                frame = frame.convert('RGB')
+
+        # Fit the frame
+        frame.thumbnail(
+            [self.width, self.height],
+            getattr(Image, resample)
+        )
+
+        return frame
 
     @classmethod
     def get_settings_form_cls(cls):
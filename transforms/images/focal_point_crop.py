@@ -99,7 +99,7 @@ class FocalPointCropTransform(BaseImageTransform):
         self.as_fallback = as_fallback
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
+        frames = self._get_frames(config, file, frames)
 
         if self.as_fallback:
 
@@ -109,8 +109,6 @@ class FocalPointCropTransform(BaseImageTransform):
                 if past_transform.name == 'crop':
                     return frames
 
-        size = frames[0].size
-
         # Get the focal point for the image
         fp = asset.meta['image'].get(
             'focal_point',
@@ -122,6 +120,15 @@ class FocalPointCropTransform(BaseImageTransform):
             }
         )
 
+        # Crop the image (the crop region is determined from the size of each
+        # frame as it's read, so no frame is decoded up front).
+        return frames.map(lambda frame: self._crop_frame(frame, fp))
+
+    def _crop_frame(self, frame, fp):
+        """Crop a frame around the focal point"""
+
+        size = frame.size
+
         crop_region = [0, 0, 1, 1]
 
         if self.aspect_ratio:
@@ -186,11 +193,7 @@ class FocalPointCropTransform(BaseImageTransform):
                 (fp['bottom'] + (pad['bottom'] * crop_size[1])) * size[1]
             ]
 
-        # Crop the image
-        for i, frame in enumerate(frames):
-            frames[i] = frame.crop(crop_region)
-
-        return frames
+        return frame.crop(crop_region)
 
     @classmethod
     def get_settings_form_cls(cls):
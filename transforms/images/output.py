@@ -16,6 +16,120 @@ IMAGE_FORMATS = {
     'WebP': 'webp'
 }
 
+# A table of encoder profiles and the encoder settings they apply for each
+# image format. Profiles trade encoding time against file size, `fast` is
+# suitable for previews, `smallest` for imagery served at high volume.
+ENCODER_PROFILES = {
+    'fast': {
+        'GIF': {'optimize': False},
+        'JPEG': {'optimize': False},
+        'PNG': {'compress_level': 1},
+        'WebP': {'method': 0}
+    },
+    'balanced': {
+        'GIF': {'optimize': True},
+        'JPEG': {'optimize': True},
+        'PNG': {'compress_level': 6},
+        'WebP': {'method': 4}
+    },
+    'smallest': {
+        'GIF': {'optimize': True},
+        'JPEG': {'optimize': True},
+        'PNG': {'optimize': True},
+        'WebP': {'method': 6, 'minimize_size': True}
+    }
+}
+
+# The encoder profile used when no profile is specified, `smallest` keeps the
+# optimizations applied before profiles were introduced (PNG `optimize` and
+# WebP `minimize_size`).
+DEFAULT_ENCODER_PROFILE = 'smallest'
+
+
+class FrameDurations(list):
+    """
+    The durations of the frames in an animation, looked up from the frames'
+    info as the encoder requests them.
+
+    Pillow's GIF and WebP encoders expect the durations of all frames as a
+    list when saving, however a frame's duration is only known once the
+    frame has been decoded. The encoders only request a frame's duration
+    once they've read the frame and so the durations are looked up from the
+    infos collected as the frames are streamed (see `FrameStream`).
+    """
+
+    def __init__(self, infos, default):
+        super().__init__()
+
+        # The info dictionaries of the frames read so far
+        self._infos = infos
+
+        # The duration used for frames that don't specify a duration
+        self._default = default
+
+    def __getitem__(self, index):
+        return self._infos[index].get('duration', self._default)
+
+
+class FrameStream:
+    """
+    Present a sequence of frames to Pillow's encoders as a single multi-frame
+    image.
+
+    Pillow's GIF and WebP encoders seek through each of the images given as
+    `append_images` in order, presenting the frames this way means they are
+    read (and converted) one at a time as the encoder requests them rather
+    than being held in memory as a list of images.
+    """
+
+    def __init__(self, frames_iter, n_frames, convert, infos):
+
+        # An iterator of the frames to stream and their source info
+        # `(frame, info)` (see `Frames.iter_with_infos`), and the number of
+        # frames.
+        self._frames_iter = frames_iter
+        self._n_frames = n_frames
+
+        # A function used to convert each frame to a mode supported by the
+        # encoder.
+        self._convert = convert
+
+        # A list the info of each frame is appended to as it's read
+        self._infos = infos
+
+        # The current frame and its index
+        self._frame = None
+        self._index = -1
+
+    def __getattr__(self, name):
+        # Proxy all other attributes to the current frame
+        return getattr(self._frame, name)
+
+    @property
+    def n_frames(self):
+        return self._n_frames
+
+    def seek(self, index):
+        """Seek to the given frame (frames can only be read in order)"""
+
+        if index == self._index:
+            return
+
+        if index != self._index + 1:
+            raise ValueError('Frames must be streamed in order')
+
+        try:
+            frame, info = next(self._frames_iter)
+        except StopIteration:
+            raise EOFError('No more frames')
+
+        self._frame = self._convert(frame)
+        self._infos.append(info)
+        self._index = index
+
+    def tell(self):
+        return self._index
+
 
 class SettingsForm(BaseForm):
 
@@ -42,6 +156,15 @@ class SettingsForm(BaseForm):
 
     versioned = fields.BooleanField('versioned')
 
+    profile = fields.StringField(
+        'profile',
+        validators=[
+            validators.Optional(),
+            validators.AnyOf(ENCODER_PROFILES.keys())
+        ],
+        default=DEFAULT_ENCODER_PROFILE
+    )
+
 
 class OutputTransform(BaseImageTransform):
     """
@@ -58,7 +181,8 @@ class OutputTransform(BaseImageTransform):
         quality=80,
         lossless=False,
         progressive=False,
-        versioned=True
+        versioned=True,
+        profile=DEFAULT_ENCODER_PROFILE
     ):
 
         # The image format to store the variation as
@@ -77,11 +201,23 @@ class OutputTransform(BaseImageTransform):
         # Whether the variation should stored with a version
         self.versioned = versioned
 
+        # The encoder profile to use (see `ENCODER_PROFILES`), the profile is
+        # optional and so may be given as empty.
+        self.profile = profile or DEFAULT_ENCODER_PROFILE
+
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
+        frames = self._get_frames(config, file, frames)
+
+        # Only the first frame is read up front, any further frames are
+        # streamed to the encoder one at a time (from the same pass over the
+        # source image).
+        frames_iter = frames.iter_with_infos()
+        first_frame, first_info = next(frames_iter)
+        infos = [first_info]
 
         # Write the image to file in the given format
         new_file = io.BytesIO()
+        encoder_args = ENCODER_PROFILES[self.profile][self.image_format]
 
         if self.image_format == 'GIF':
 
@@ -90,19 +226,18 @@ class OutputTransform(BaseImageTransform):
             if len(frames) > 1:
 
                 # Build animation arguments
-                base_duration = frames[0].info.get('duration', 100)
-                save_args['duration'] = [
-                    f.info.get('duration', base_duration)
-                    for f in frames
-                ]
-                save_args['loop'] = frames[0].info.get('loop', 0)
+                save_args['duration'] = FrameDurations(
+                    infos,
+                    first_info.get('duration', 100)
+                )
+                save_args['loop'] = first_frame.info.get('loop', 0)
                 save_args['save_all'] = True
 
-            if 'transparency' in frames[0].info:
+            if 'transparency' in first_frame.info:
 
                 # Extract transparency color
                 save_args['transparency'] \
-                        = frames[0].info['transparency']
+                        = first_frame.info['transparency']
 
                 if type(save_args['transparency']) is bytes:
                     save_args['transparency'] = int.from_bytes(
@@ -111,24 +246,29 @@ class OutputTransform(BaseImageTransform):
                     )
 
             # Convert frames to P mode
-            for i, frame in enumerate(frames):
-                if frame.mode != 'P':
-                    frames[i] = frame.convert('P')
+            first_frame = self._to_gif_mode(first_frame)
 
             if len(frames) > 1:
                 # Add the frames of animation to the save args
-                save_args['append_images'] = frames[1:]
+                save_args['append_images'] = [
+                    FrameStream(
+                        frames_iter,
+                        len(frames) - 1,
+                        self._to_gif_mode,
+                        infos
+                    )
+                ]
 
-            frames[0].save(
+            first_frame.save(
                 new_file,
                 format=self.image_format,
-                optimze=True,
                 disposal=2,
+                **encoder_args,
                 **save_args
             )
 
         elif self.image_format == 'JPEG':
-            image = frames[0]
+            image = first_frame
 
             if image.mode != 'RGB':
                 image = image.convert('RGBA').convert('RGB')
@@ -136,17 +276,17 @@ class OutputTransform(BaseImageTransform):
             image.save(
                 new_file,
                 format=self.image_format,
-                optimize=True,
                 progressive=self.progressive,
-                quality=self.quality
+                quality=self.quality,
+                **encoder_args
             )
 
         elif self.image_format == 'PNG':
-            image = frames[0]
+            image = first_frame
             image.save(
                 new_file,
                 format=self.image_format,
-                optimize=True
+                **encoder_args
             )
 
         elif self.image_format == 'WebP':
@@ -156,20 +296,19 @@ class OutputTransform(BaseImageTransform):
             if len(frames) > 1:
 
                 # Build animation arguments
-                base_duration = frames[0].info.get('duration', 100)
-                save_args['duration'] = [
-                    f.info.get('duration', base_duration)
-                    for f in frames
-                ]
-                save_args['loop'] = frames[0].info.get('loop', 0)
+                save_args['duration'] = FrameDurations(
+                    infos,
+                    first_info.get('duration', 100)
+                )
+                save_args['loop'] = first_frame.info.get('loop', 0)
                 save_args['save_all'] = True
 
-            if 'background' in frames[0].info:
+            if 'background' in first_frame.info:
 
                 # Extract background color
-                save_args['background'] = frames[0].info['background']
+                save_args['background'] = first_frame.info['background']
                 if type(save_args['background']) is int:
-                    palette = frames[0].getpalette()
+                    palette = first_frame.getpalette()
 
                     if palette:
                         palette = list(zip(*([iter(palette)] * 3)))
@@ -183,29 +322,30 @@ class OutputTransform(BaseImageTransform):
                         # If there's no longer a palette associated with the
                         # frame (e.g the colour mode changed from 'P' then
                         # don't set a background color.
-                        del frames[0].info['background']
+                        del first_frame.info['background']
                         del save_args['background']
 
             # Convert frames to RGB(A) mode
-            for i, frame in enumerate(frames):
-                if frame.mode not in ['RGB', 'RGBA']:
-                    if 'transparency' in frames[i].info:
-                        frames[i] = frame.convert('RGBA')
-                    else:
-                        frames[i] = frame.convert('RGB')
+            first_frame = self._to_webp_mode(first_frame)
 
             if len(frames) > 1:
                 # Add the frames of animation to the save args
-                save_args['append_images'] = frames[1:]
+                save_args['append_images'] = [
+                    FrameStream(
+                        frames_iter,
+                        len(frames) - 1,
+                        self._to_webp_mode,
+                        infos
+                    )
+                ]
 
-            frames[0].save(
+            first_frame.save(
                 new_file,
                 allow_mixed=True,
                 format=self.image_format,
                 lossless=self.lossless,
                 quality=self.quality,
-                minimize_size=True,
-                optimize=True,
+                **encoder_args,
                 **save_args
             )
 
@@ -220,13 +360,27 @@ class OutputTransform(BaseImageTransform):
             {
                 'length': new_file.getbuffer().nbytes,
                 'image': {
-                    'mode': frames[0].mode,
-                    'size': frames[0].size
+                    'mode': first_frame.mode,
+                    'size': first_frame.size
                 }
             },
             new_file
         )
 
+    def _to_gif_mode(self, frame):
+        """Convert a frame to a color mode suitable for GIF output"""
+        if frame.mode != 'P':
+            return frame.convert('P')
+        return frame
+
+    def _to_webp_mode(self, frame):
+        """Convert a frame to a color mode suitable for WebP output"""
+        if frame.mode not in ['RGB', 'RGBA']:
+            if 'transparency' in frame.info:
+                return frame.convert('RGBA')
+            return frame.convert('RGB')
+        return frame
+
     @classmethod
     def get_settings_form_cls(cls):
         return SettingsForm
@@ -31,15 +31,14 @@ class RotateTransform(BaseImageTransform):
         self.degrees = degrees
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
-
-        for i, frame in enumerate(frames):
-
-            frames[i] = frame.transpose(
-                getattr(Image, f'ROTATE_{360 - self.degrees}')
-            )
-
-        return frames
+        frames = self._get_frames(config, file, frames)
+        return frames.map(self._rotate_frame)
+
+    def _rotate_frame(self, frame):
+        """Rotate a frame"""
+        return frame.transpose(
+            getattr(Image, f'ROTATE_{360 - self.degrees}')
+        )
 
     @classmethod
     def get_settings_form_cls(cls):
@@ -29,7 +29,7 @@ class SingleFrameTransform(BaseImageTransform):
         self.frame_number = frame_number
 
     def transform(self, config, asset, file, variation_name, frames, history):
-        frames = self._get_frames(file, frames)
+        frames = self._get_frames(config, file, frames)
 
         # Wrap the frame number to ensure it's within the total number of
         # frames.
@@ -37,9 +37,7 @@ class SingleFrameTransform(BaseImageTransform):
         frame_number = (self.frame_number - last) % last
 
         # Extract the frame
-        frames = [frames[frame_number]]
-
-        return frames
+        return frames[frame_number:frame_number + 1]
 
     @classmethod
     def get_settings_form_cls(cls):
@@ -0,0 +1,59 @@
+import argparse
+
+from workers.pool import WorkerPool
+
+
+if __name__ == '__main__':
+
+    # Parse command-line arguments
+    parser = argparse.ArgumentParser(description='Asset worker pool')
+    parser.add_argument(
+        '-e',
+        '--env',
+        choices=['staging', 'local', 'production', 'test'],
+        default='local',
+        dest='env',
+        required=False
+    )
+    parser.add_argument(
+        '-n',
+        '--size',
+        default=1,
+        dest='size',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-m',
+        '--max-size',
+        default=0,
+        dest='max_size',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-i',
+        '--idle-lifespan',
+        default='0',
+        dest='idle_lifespan',
+        required=False,
+        type=int
+    )
+    parser.add_argument(
+        '-s',
+        '--spawned-idle-lifespan',
+        default='60',
+        dest='spawned_idle_lifespan',
+        required=False,
+        type=int
+    )
+    args = parser.parse_args()
+
+    pool = WorkerPool(
+        args.env,
+        args.size,
+        idle_lifespan=args.idle_lifespan,
+        spawned_idle_lifespan=args.spawned_idle_lifespan,
+        max_size=args.max_size
+    )
+    pool.start()
@@ -0,0 +1,215 @@
+"""
+Counters for tasks and workers, maintained as tasks are added and performed
+so that the state of the task queue can be read in a single round trip to
+redis (rather than loading every task and worker record).
+
+For each type of task we maintain:
+
+- a sorted set of the incomplete tasks scored by the time they were added,
+- a hash of the tasks being performed `{task_id: worker_id}`,
+- a count of the tasks that have failed.
+
+Workers are held in a sorted set scored by the time their status expires.
+
+Tasks are recorded before they are added and so a task that failed to be
+added, or was removed without being completed, would otherwise remain in the
+counters. When the counters are read the oldest tasks are pruned from them
+if the task no longer exists (see `PRUNE_TASKS_SCRIPT`).
+"""
+
+import time
+
+__all__ = [
+    'add_task',
+    'async_get_counters',
+    'complete_task',
+    'get_counters',
+    'get_failed_key',
+    'get_running_key',
+    'get_tasks_key',
+    'remove_worker',
+    'start_task',
+    'update_worker',
+    'WORKERS_KEY'
+]
+
+
+# Constants
+
+# The key of the sorted set of workers
+WORKERS_KEY = 'h51_counters:workers'
+
+# The time (in seconds) a task must have been recorded for before it can be
+# pruned from the counters (tasks are recorded before they are added).
+PRUNE_GRACE_PERIOD = 60
+
+# The maximum number of tasks checked for pruning each time the counters are
+# read.
+PRUNE_BATCH_SIZE = 100
+
+# A script that prunes tasks that no longer exist from the counters. Tasks
+# are checked oldest first until a task that exists is found, tasks that
+# have been removed (without being completed) remain in the counters and so
+# will always eventually be the oldest.
+#
+# KEYS: tasks key, running key
+# ARGV: maximum score (time recorded) of tasks to check, batch size
+PRUNE_TASKS_SCRIPT = '''
+local task_ids = redis.call(
+    'zrangebyscore',
+    KEYS[1],
+    '-inf',
+    ARGV[1],
+    'LIMIT',
+    0,
+    ARGV[2]
+)
+
+local pruned = 0
+for _, task_id in ipairs(task_ids) do
+    if redis.call('exists', task_id) == 1 then
+        break
+    end
+
+    redis.call('zrem', KEYS[1], task_id)
+    redis.call('hdel', KEYS[2], task_id)
+    pruned = pruned + 1
+end
+
+return pruned
+'''
+
+
+# Functions
+
+def add_task(conn, task):
+    """
+    Record that a task has been added (this must be called before the task
+    is added).
+    """
+    conn.zadd(get_tasks_key(type(task)), {task.id: task.timestamp / 10 ** 9})
+
+async def async_get_counters(conn, task_cls_list):
+    """Asynchronous return the counters (see `get_counters`)"""
+
+    now = time.time()
+
+    pipe = conn.pipeline()
+
+    for task_cls in task_cls_list:
+        pipe.eval(
+            PRUNE_TASKS_SCRIPT,
+            keys=[get_tasks_key(task_cls), get_running_key(task_cls)],
+            args=[now - PRUNE_GRACE_PERIOD, PRUNE_BATCH_SIZE]
+        )
+        pipe.zcard(get_tasks_key(task_cls))
+        pipe.hlen(get_running_key(task_cls))
+        pipe.get(get_failed_key(task_cls))
+        pipe.zrange(get_tasks_key(task_cls), 0, 0, withscores=True)
+
+    pipe.zcount(WORKERS_KEY, now, float('inf'))
+
+    return _parse_counters(task_cls_list, await pipe.execute(), now)
+
+def complete_task(conn, task, failed=False):
+    """Record that a task has been completed (or failed)"""
+
+    pipe = conn.pipeline()
+    pipe.zrem(get_tasks_key(type(task)), task.id)
+    pipe.hdel(get_running_key(type(task)), task.id)
+
+    if failed:
+        pipe.incr(get_failed_key(type(task)))
+
+    pipe.execute()
+
+def get_counters(conn, task_cls_list):
+    """
+    Return the counters for the given task classes and the number of workers
+    as a dictionary:
+
+        {
+            'tasks': {
+                task_prefix: {
+                    'queued': ...,
+                    'running': ...,
+                    'failed': ...,
+                    'oldest_age': ... # The age of the oldest incomplete task
+                                      # in seconds (or `None`).
+                },
+                ...
+            },
+            'workers': ...
+        }
+    """
+
+    now = time.time()
+
+    pipe = conn.pipeline(transaction=False)
+
+    for task_cls in task_cls_list:
+        pipe.eval(
+            PRUNE_TASKS_SCRIPT,
+            2,
+            get_tasks_key(task_cls),
+            get_running_key(task_cls),
+            now - PRUNE_GRACE_PERIOD,
+            PRUNE_BATCH_SIZE
+        )
+        pipe.zcard(get_tasks_key(task_cls))
+        pipe.hlen(get_running_key(task_cls))
+        pipe.get(get_failed_key(task_cls))
+        pipe.zrange(get_tasks_key(task_cls), 0, 0, withscores=True)
+
+    pipe.zcount(WORKERS_KEY, now, '+inf')
+
+    return _parse_counters(task_cls_list, pipe.execute(), now)
+
+def get_failed_key(task_cls):
+    """Return the key for the count of failed tasks of the given class"""
+    return f'h51_counters:{task_cls.get_id_prefix()}:failed'
+
+def get_running_key(task_cls):
+    """Return the key for the hash of running tasks of the given class"""
+    return f'h51_counters:{task_cls.get_id_prefix()}:running'
+
+def get_tasks_key(task_cls):
+    """Return the key for the set of incomplete tasks of the given class"""
+    return f'h51_counters:{task_cls.get_id_prefix()}:tasks'
+
+def remove_worker(conn, worker_id):
+    """Remove a worker (that's shutting down)"""
+    conn.zrem(WORKERS_KEY, worker_id)
+
+def start_task(conn, task, worker_id):
+    """Record that a worker has started a task"""
+    conn.hset(get_running_key(type(task)), task.id, worker_id)
+
+def update_worker(conn, worker_id, status_interval):
+    """
+    Record that a worker is active (until the status interval expires) and
+    remove workers whose status has expired.
+    """
+
+    now = time.time()
+
+    pipe = conn.pipeline()
+    pipe.zadd(WORKERS_KEY, {worker_id: now + status_interval})
+    pipe.zremrangebyscore(WORKERS_KEY, 0, now)
+    pipe.execute()
+
+def _parse_counters(task_cls_list, results, now):
+    """Return the counters from the results of the counters pipeline"""
+
+    counters = {'tasks': {}, 'workers': results[-1]}
+    for i, task_cls in enumerate(task_cls_list):
+        _, incomplete, running, failed, oldest = results[i * 5:i * 5 + 5]
+
+        counters['tasks'][task_cls.get_id_prefix()] = {
+            'queued': max(incomplete - running, 0),
+            'running': running,
+            'failed': int(failed or 0),
+            'oldest_age': now - oldest[0][1] if oldest else None
+        }
+
+    return counters
@@ -0,0 +1,98 @@
+"""
+Bulk jobs group the tasks added by a single bulk request (e.g transforming
+many assets) so that one notification can be sent when all of the tasks are
+complete.
+
+A job is stored in redis as a hash containing the job's details and a count
+of its outstanding tasks, errors for the job's tasks are stored in a separate
+hash.
+"""
+
+import json
+
+__all__ = [
+    'complete_job_task',
+    'get_job_errors_key',
+    'get_job_key'
+]
+
+
+# Constants
+
+# A script that records a completed task against a job, the script returns
+# the job and its errors (as lists of fields and values) if the task was the
+# job's last outstanding task. The job is only updated if it exists, so that
+# completing a task for an expired job doesn't recreate the job without an
+# expiry.
+#
+# KEYS: job key, job errors key
+# ARGV: task name, failed (1 or 0), error
+COMPLETE_JOB_TASK_SCRIPT = '''
+if redis.call('exists', KEYS[1]) == 0 then
+    return nil
+end
+
+local ttl = redis.call('ttl', KEYS[1])
+
+if ARGV[2] == '1' then
+    redis.call('hset', KEYS[2], ARGV[1], ARGV[3])
+    if ttl > 0 then
+        redis.call('expire', KEYS[2], ttl)
+    end
+end
+
+local outstanding = redis.call('hincrby', KEYS[1], 'outstanding', -1)
+if outstanding > 0 then
+    if ttl > 0 then
+        redis.call('expire', KEYS[1], ttl)
+    end
+    return nil
+end
+
+local job = redis.call('hgetall', KEYS[1])
+local errors = redis.call('hgetall', KEYS[2])
+redis.call('del', KEYS[1], KEYS[2])
+
+return {job, errors}
+'''
+
+
+# Functions
+
+def complete_job_task(conn, job_id, name, error=None):
+    """
+    Record that a task (identified by name) in a job has completed, if the
+    task failed the error is recorded against the job.
+
+    If this was the last outstanding task for the job the job is removed and
+    returned as a dictionary (including a table of the errors for the job's
+    tasks `{name: reason}`), otherwise `None` is returned. Tasks completed
+    for jobs that no longer exist (e.g the job expired) are ignored.
+    """
+
+    result = conn.eval(
+        COMPLETE_JOB_TASK_SCRIPT,
+        2,
+        get_job_key(job_id),
+        get_job_errors_key(job_id),
+        name,
+        1 if error else 0,
+        str(error) if error else ''
+    )
+
+    if not result:
+        return None
+
+    job, errors = (dict(zip(r[::2], r[1::2])) for r in result)
+    job['asset_ids'] = json.loads(job['asset_ids'])
+    job['errors'] = errors
+
+    return job
+
+def get_job_errors_key(job_id):
+    """Return the key for the errors recorded against a job"""
+    return f'h51_job_errors:{job_id}'
+
+def get_job_key(job_id):
+    """Return the key for a job"""
+    return f'h51_job:{job_id}'
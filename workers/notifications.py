@@ -0,0 +1,334 @@
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import uuid
+
+from bson.objectid import ObjectId
+from flask import Config
+import mongoframes
+import pymongo
+import redis
+import redis.sentinel
+import requests
+import requests.adapters
+import sentry_sdk
+from sentry_sdk.integrations.logging import LoggingIntegration
+from sentry_sdk.integrations.redis import RedisIntegration
+
+from blueprints.accounts.models import Account
+
+__all__ = [
+    'NotificationDispatcher',
+    'enqueue_notification'
+]
+
+
+# Constants
+
+# The key of the list of notifications waiting to be delivered
+QUEUE_KEY = 'h51_notifications'
+
+# The key of the sorted set of notifications waiting to be retried (scored by
+# the time they should next be attempted).
+RETRY_KEY = 'h51_notifications_retry'
+
+
+# Classes
+
+class NotificationDispatcher:
+    """
+    A dispatcher that delivers queued notifications (see
+    `enqueue_notification`) to their notification URLs.
+
+    Notifications are delivered concurrently using a pool of threads sharing
+    a HTTP session (which pools connections per host). Notifications for the
+    same URL taken from the queue together are delivered as a batch over one
+    connection. Failed deliveries are retried with an exponential backoff.
+
+    Notifications are queued against the account they are for and signed
+    using the account's API key (looked up when the notification is
+    delivered), API keys are never stored in the queue.
+    """
+
+    def __init__(self, env):
+
+        # Load settings
+        self.config = Config(os.path.dirname(os.path.realpath(__file__)))
+        # There may be overiding settings specific to the server we are running on
+        servername = socket.gethostname().split('.')[0]
+        if servername and os.path.isfile(f'settings/workers/{env}_{servername}.py'):
+            self.config.from_object(f'settings.workers.{env}_{servername}.Config')
+        else:
+            self.config.from_object(f'settings.workers.{env}.Config')
+
+        # Sentry (logging)
+        if self.config.get('SENTRY_DSN'):
+
+            sentry_logging = LoggingIntegration(
+                level=logging.INFO,
+                event_level=logging.WARNING
+            )
+
+            self.sentry = sentry_sdk.init(
+                self.config.get('SENTRY_DSN'),
+                integrations=[
+                    sentry_logging,
+                    RedisIntegration()
+                ]
+            )
+
+        # Mongo database
+        self.mongo = pymongo.MongoClient(self.config.get('MONGO_URI'))
+        self.db = self.mongo.get_default_database()
+        mongoframes.Frame._client = self.mongo
+
+        if self.config.get('MONGO_PASSWORD'):
+            self.db.authenticate(
+                self.config.get('MONGO_USERNAME'),
+                self.config.get('MONGO_PASSWORD')
+            )
+
+        # Redis
+        if self.config['REDIS_USE_SENTINEL']:
+            sentinel = redis.sentinel.Sentinel(
+                self.config['REDIS_ADDRESS'],
+                db=self.config['REDIS_DB'],
+                password=self.config['REDIS_PASSWORD'],
+                decode_responses=True
+            )
+            self._conn = sentinel.master_for(
+                self.config['REDIS_SENTINEL_MASTER']
+            )
+
+        else:
+            self._conn = redis.StrictRedis(
+                host=self.config['REDIS_ADDRESS'][0],
+                port=self.config['REDIS_ADDRESS'][1],
+                db=self.config['REDIS_DB'],
+                password=self.config['REDIS_PASSWORD'],
+                decode_responses=True
+            )
+
+        threads = self.config['NOTIFICATION_DISPATCHER_THREADS']
+
+        # The HTTP session used to deliver notifications
+        self._session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=threads,
+            pool_maxsize=threads
+        )
+        self._session.mount('http://', adapter)
+        self._session.mount('https://', adapter)
+
+        # The thread pool notifications are delivered on, and a semaphore
+        # used to limit the number of batches taken from the queue to the
+        # number that can be delivered at once.
+        self._executor = ThreadPoolExecutor(
+            max_workers=threads,
+            thread_name_prefix='h51_notifications'
+        )
+        self._slots = threading.Semaphore(threads)
+
+    def deliver(self, notification):
+        """
+        Deliver a notification, return True if the notification was
+        delivered.
+        """
+
+        account = Account.by_id(
+            ObjectId(notification['account_id']),
+            projection={'api_key': True}
+        )
+
+        if not account:
+            # The account has been removed, the notification is dropped
+            return True
+
+        # Generate the signature
+        timestamp = str(int(time.time()))
+        signature = hashlib.sha1()
+        signature.update(
+            ''.join([
+                timestamp,
+                notification['body'],
+                account.api_key
+            ]).encode('utf8')
+        )
+
+        try:
+            r = self._session.post(
+                notification['url'],
+                data=notification['body'],
+                headers={
+                    'X-H51-Timestamp': timestamp,
+                    'X-H51-Signature': signature.hexdigest()
+                },
+                timeout=self.config['NOTIFICATION_TIMEOUT']
+            )
+
+        except requests.exceptions.RequestException:
+            return False
+
+        # Client errors are not retried
+        return r.status_code < 500
+
+    def deliver_batch(self, notifications):
+        """Deliver a batch of notifications (for the same URL)"""
+
+        try:
+            for notification in notifications:
+
+                # An unexpected error delivering one notification must not
+                # prevent the rest of the batch from being delivered.
+                try:
+                    delivered = self.deliver(notification)
+
+                except Exception:
+                    logging.exception(
+                        'Unexpected error delivering notification to '
+                        f'{notification.get("url")}'
+                    )
+                    delivered = False
+
+                if not delivered:
+                    try:
+                        self.retry(notification)
+
+                    except Exception:
+                        logging.exception(
+                            'Unable to schedule notification retry to '
+                            f'{notification.get("url")}'
+                        )
+
+        finally:
+            self._slots.release()
+
+    def requeue_retries(self):
+        """Move notifications that are due to be retried back onto the queue"""
+
+        due = self._conn.zrangebyscore(
+            RETRY_KEY,
+            0,
+            time.time(),
+            start=0,
+            num=self.config['NOTIFICATION_BATCH_SIZE']
+        )
+
+        for raw_notification in due:
+
+            # Only the dispatcher that removes the notification requeues it
+            if self._conn.zrem(RETRY_KEY, raw_notification):
+                self._conn.lpush(QUEUE_KEY, raw_notification)
+
+    def retry(self, notification):
+        """Schedule a failed notification to be retried (if attempts remain)"""
+
+        notification['attempts'] = notification.get('attempts', 0) + 1
+
+        max_attempts = self.config['NOTIFICATION_MAX_ATTEMPTS']
+        if notification['attempts'] >= max_attempts:
+            logging.warning(
+                f'Notification to {notification["url"]} failed after '
+                f'{notification["attempts"]} attempts'
+            )
+            return
+
+        delay = min(
+            self.config['NOTIFICATION_RETRY_DELAY']
+                    * (2 ** (notification['attempts'] - 1)),
+            self.config['NOTIFICATION_MAX_RETRY_DELAY']
+        )
+
+        self._conn.zadd(
+            RETRY_KEY,
+            {json.dumps(notification): time.time() + delay}
+        )
+
+    def start(self):
+        """Start delivering notifications"""
+
+        batch_size = self.config['NOTIFICATION_BATCH_SIZE']
+
+        while True:
+
+            self.requeue_retries()
+
+            # Wait for a free thread to deliver notifications on
+            self._slots.acquire()
+
+            # Wait for notifications
+            popped = self._conn.brpop(QUEUE_KEY, timeout=1)
+            if not popped:
+                self._slots.release()
+                continue
+
+            # Take any other notifications waiting (up to the batch size) so
+            # that notifications for the same URL can be batched.
+            raw_notifications = [popped[1]]
+            while len(raw_notifications) < batch_size:
+                raw_notification = self._conn.rpop(QUEUE_KEY)
+                if not raw_notification:
+                    break
+
+                raw_notifications.append(raw_notification)
+
+            batches = defaultdict(list)
+            for raw_notification in raw_notifications:
+                notification = self._load_notification(raw_notification)
+                if notification:
+                    batches[notification['url']].append(notification)
+
+            batches = list(batches.values())
+            if not batches:
+                self._slots.release()
+                continue
+
+            for i, batch in enumerate(batches):
+
+                # The first batch uses the slot acquired above
+                if i > 0:
+                    self._slots.acquire()
+
+                self._executor.submit(self.deliver_batch, batch)
+
+    def _load_notification(self, raw_notification):
+        """
+        Load a notification taken from the queue, malformed notifications
+        are logged and `None` is returned.
+        """
+
+        try:
+            notification = json.loads(raw_notification)
+        except ValueError:
+            notification = None
+
+        if not isinstance(notification, dict) or 'url' not in notification:
+            logging.warning('Malformed notification discarded')
+            return None
+
+        return notification
+
+
+# Functions
+
+def enqueue_notification(conn, url, account_id, body):
+    """
+    Add a notification (for the given account) to the queue to be POSTed to
+    the given URL by a `NotificationDispatcher`.
+    """
+    conn.lpush(
+        QUEUE_KEY,
+        json.dumps({
+            'id': str(uuid.uuid4()),
+            'url': url,
+            'account_id': str(account_id),
+            'body': body,
+            'attempts': 0
+        })
+    )
@@ -0,0 +1,213 @@
+"""
+A pre-fork pool of asset workers.
+
+The pool (parent) process imports the modules workers require, and loads
+their read-only data (e.g analyzers, transforms and the face detection
+classifier), once and then forks the workers. Forked workers share the
+parent's memory pages (copy-on-write) and so start faster and use less memory
+than workers started as new processes.
+
+Database and redis clients are not fork safe and so each worker creates its
+own after it has been forked (the pool never connects).
+"""
+
+import gc
+import os
+import select
+import signal
+import sys
+import time
+import traceback
+
+from swm.population.spawners import BaseSpawner
+
+from analyzers import get_analyzers
+
+from .workers import AssetWorker
+
+__all__ = [
+    'PoolSpawner',
+    'WorkerPool'
+]
+
+
+class PoolSpawner(BaseSpawner):
+    """
+    Spawn new workers by requesting the pool the worker belongs to forks
+    them.
+    """
+
+    def __init__(self, fd):
+
+        # The file descriptor of the pipe used to request workers
+        self._fd = fd
+
+    def spawn(self, amount):
+        os.write(self._fd, b'+' * amount)
+
+
+class WorkerPool:
+    """
+    A pool that forks and supervises asset workers.
+
+    The pool maintains a fixed number of workers (workers that exit with an
+    error are replaced). Workers can spawn additional workers (see the
+    `ASSET_WORKER_AUTOSCALE` setting) which are forked by the pool with the
+    spawned idle lifespan, these workers are not replaced when they retire.
+    """
+
+    def __init__(
+        self,
+        env,
+        size,
+        idle_lifespan=0,
+        spawned_idle_lifespan=60,
+        max_size=0,
+        kill_delay=10
+    ):
+
+        # The environment workers are configured for
+        self.env = env
+
+        # The number of workers the pool maintains, and the maximum number of
+        # workers (including spawned workers) the pool will fork (0 for no
+        # limit).
+        self.size = size
+        self.max_size = max_size
+
+        # The idle lifespan of the workers the pool maintains and of workers
+        # spawned on request.
+        self.idle_lifespan = idle_lifespan
+        self.spawned_idle_lifespan = spawned_idle_lifespan
+
+        # The time (in seconds) workers are given to shut down before they
+        # are killed when the pool shuts down.
+        self.kill_delay = kill_delay
+
+        # A table of the workers forked by the pool `{pid: maintained}`
+        self._workers = {}
+
+        # A pipe workers write to to request the pool spawns workers
+        self._spawn_fd_r, self._spawn_fd_w = os.pipe()
+
+        # Flag indicating the pool is shutting down
+        self._shutting_down = False
+
+    def fork_worker(self, maintained):
+        """
+        Fork a new worker, maintained workers use the pool's idle lifespan
+        (and are replaced if they fail), other workers use the spawned idle
+        lifespan.
+        """
+
+        pid = os.fork()
+
+        if pid:
+            self._workers[pid] = maintained
+            return pid
+
+        # Worker (child) process
+        os.close(self._spawn_fd_r)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+
+        exit_code = 0
+        try:
+            worker = AssetWorker(
+                self.env,
+                self.idle_lifespan if maintained \
+                        else self.spawned_idle_lifespan,
+                population_spawner=PoolSpawner(self._spawn_fd_w)
+            )
+            worker.start()
+
+        except Exception:
+            traceback.print_exc()
+            exit_code = 1
+
+        finally:
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(exit_code)
+
+    def preload(self):
+        """
+        Prepare the pool's memory to be shared by forked workers.
+
+        Analyzers import their dependencies (and load their data) when first
+        run, here we preload them. We then move the objects created so far
+        out of the garbage collector's tracking so that collections in
+        workers don't touch (and so copy) the shared pages.
+        """
+        for analyzer_cls in get_analyzers().values():
+            analyzer_cls.preload()
+
+        gc.collect()
+        gc.freeze()
+
+    def reap_workers(self):
+        """Remove workers that have exited, replacing any that failed"""
+
+        while self._workers:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if not pid:
+                break
+
+            maintained = self._workers.pop(pid, False)
+
+            # Maintained workers that exit cleanly have been shut down (e.g
+            # by the `shutdown-workers` command) and are not replaced.
+            if maintained and status != 0 and not self._shutting_down:
+                self.fork_worker(True)
+
+    def shut_down(self, *args):
+        """Shut down the pool's workers"""
+
+        self._shutting_down = True
+
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        # Allow time for the workers to shut down before killing them
+        deadline = time.time() + self.kill_delay
+        while self._workers and time.time() < deadline:
+            self.reap_workers()
+            time.sleep(0.1)
+
+        for pid in list(self._workers):
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def spawn_workers(self):
+        """Fork the workers requested by workers in the pool"""
+
+        amount = len(os.read(self._spawn_fd_r, 1024))
+        if self.max_size:
+            amount = min(amount, self.max_size - len(self._workers))
+
+        for i in range(amount):
+            self.fork_worker(False)
+
+    def start(self):
+        """Start the pool"""
+
+        self.preload()
+
+        signal.signal(signal.SIGINT, self.shut_down)
+        signal.signal(signal.SIGTERM, self.shut_down)
+
+        for i in range(self.size):
+            self.fork_worker(True)
+
+        while self._workers and not self._shutting_down:
+
+            readable, _, _ = select.select([self._spawn_fd_r], [], [], 1)
+            if readable and not self._shutting_down:
+                self.spawn_workers()
+
+            self.reap_workers()
@@ -0,0 +1,147 @@
+"""
+A population control that scales the asset worker population to the task
+queue (the number of tasks waiting and the age of the oldest) within the
+limits of the population and of each node's CPU and memory.
+"""
+
+import math
+import os
+import time
+
+import psutil
+from swm.population.controls import BaseControl
+
+__all__ = ['QueueDepthControl']
+
+
+class QueueDepthControl(BaseControl):
+    """
+    Grow the population when tasks are waiting (or have waited too long) and
+    allow it to shrink when the population is well above the size required
+    to perform the queued tasks for a period of time.
+
+    Workers only shrink the population by shutting themselves down once
+    they've been idle for their idle lifespan, so workers that should be
+    retired must be spawned with an idle lifespan.
+    """
+
+    def __init__(
+        self,
+        min_population=1,
+        max_population=0,
+        max_node_population=None,
+        tasks_per_worker=1,
+        max_task_age=30,
+        max_spawn_rate=2,
+        max_cpu_percent=90,
+        max_memory_percent=80,
+        scale_down_ratio=0.5,
+        scale_down_delay=60
+    ):
+
+        # The minimum and maximum (0 for no limit) population of workers
+        self._min_population = min_population
+        self._max_population = max_population
+
+        # The maximum population of workers on a node (0 for no limit, if
+        # `None` the number of available cores is used).
+        self._max_node_population = max_node_population
+        if self._max_node_population is None:
+            self._max_node_population = max(1, len(os.sched_getaffinity(0)))
+
+        # The number of queued tasks per worker the population is sized for
+        self._tasks_per_worker = tasks_per_worker
+
+        # The maximum age (in seconds) of the oldest queued task, if a task
+        # has waited longer the population is grown by at least one worker.
+        self._max_task_age = max_task_age
+
+        # The maximum number of workers spawned at once (0 for no limit)
+        self._max_spawn_rate = max_spawn_rate
+
+        # The CPU and memory usage (as a percentage) of a node above which
+        # new workers will not be spawned on the node.
+        self._max_cpu_percent = max_cpu_percent
+        self._max_memory_percent = max_memory_percent
+
+        # The population is allowed to shrink when the required population
+        # has been no more than this ratio of the current population for the
+        # given delay (in seconds), this prevents the population changing in
+        # response to short lulls in the queue.
+        self._scale_down_ratio = scale_down_ratio
+        self._scale_down_delay = scale_down_delay
+
+        # The time since which the population has been over-provisioned
+        self._over_provisioned_since = None
+
+    def population_change(self, workers, node_workers, tasks):
+
+        now = time.time()
+        population = len(workers)
+
+        # Determine the tasks waiting to be performed (tasks assigned to
+        # workers that are no longer registered will be reclaimed).
+        queued = [
+            t for t in tasks.values()
+            if not (t.assigned_to and t.assigned_to in workers)
+        ]
+        running = len(tasks) - len(queued)
+
+        # Determine the required population
+        required = running + math.ceil(len(queued) / self._tasks_per_worker)
+
+        oldest_age = max(
+            (now - t.timestamp / 10 ** 9 for t in queued),
+            default=0
+        )
+        if oldest_age > self._max_task_age:
+            required = max(required, population + 1)
+
+        required = min(
+            self._max_population or math.inf,
+            max(self._min_population, required)
+        )
+
+        if required > population:
+            self._over_provisioned_since = None
+
+            if not self._node_has_capacity():
+                return 0
+
+            return max(
+                0,
+                min(
+                    required - population,
+                    self._max_spawn_rate or math.inf,
+                    (self._max_node_population or math.inf) \
+                            - len(node_workers)
+                )
+            )
+
+        if required < population \
+                and required <= population * self._scale_down_ratio:
+
+            if self._over_provisioned_since is None:
+                self._over_provisioned_since = now
+
+            if now - self._over_provisioned_since >= self._scale_down_delay:
+                return required - population
+
+            return 0
+
+        self._over_provisioned_since = None
+
+        return 0
+
+    def _node_has_capacity(self):
+        """Return `True` if the node has capacity for more workers"""
+
+        # NOTE: The CPU usage is measured since the last call, the first call
+        # always returns 0.
+        if psutil.cpu_percent() > self._max_cpu_percent:
+            return False
+
+        if psutil.virtual_memory().percent > self._max_memory_percent:
+            return False
+
+        return True
@@ -1,8 +1,7 @@
 import hashlib
-import time
+import json
 
 from bson.objectid import ObjectId
-import requests
 from swm import tasks
 
 from analyzers import get_analyzer
@@ -10,15 +9,36 @@ from blueprints.accounts.models import Account
 from blueprints.assets.models import Asset
 from transforms import get_transform
 
+from .notifications import enqueue_notification
+
 __all__ = [
     'AnalyzeTask',
     'GenerateVariationTask'
 ]
 
+# A script that releases the flight for a task, the flight is only deleted if
+# it's still claimed by the task (the flight may have expired and been
+# claimed by another task).
+#
+# KEYS: flight key
+# ARGV: task id
+RELEASE_FLIGHT_SCRIPT = '''
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+'''
+
 
 class AssetTask(tasks.BaseTask):
 
-    def __init__(self, account_id, asset_id, notification_url=None):
+    def __init__(
+        self,
+        account_id,
+        asset_id,
+        notification_url=None,
+        job_id=None
+    ):
         super().__init__()
 
         # The Id of the account the task was created for
@@ -30,6 +50,9 @@ class AssetTask(tasks.BaseTask):
         # A URL to POST to when the task is completed
         self._notification_url = notification_url
 
+        # The Id of the bulk job the task belongs to (if any), see `jobs`
+        self._job_id = job_id
+
     @property
     def account_id(self):
         return self._account_id
@@ -38,6 +61,10 @@ class AssetTask(tasks.BaseTask):
     def asset_id(self):
         return self._asset_id
 
+    @property
+    def job_id(self):
+        return self._job_id
+
     @property
     def notification_url(self):
         return self._notification_url
@@ -75,42 +102,28 @@ class AssetTask(tasks.BaseTask):
 
         return backend.retrieve(asset.store_key)
 
-    def post_notification(self, api_key, body):
-        """POST the given body to the requested notification URL"""
+    def post_notification(self, conn, body):
+        """
+        Queue the given body to be POSTed to the requested notification URL
+        (notifications are delivered by the `NotificationDispatcher`).
+        """
 
         if not self._notification_url:
             return
 
-        # Generate the signature
-        timestamp = str(int(time.time()))
-        signature = hashlib.sha1()
-        signature.update(
-            ''.join([
-                timestamp,
-                body,
-                api_key
-            ]).encode('utf8')
+        enqueue_notification(
+            conn,
+            self._notification_url,
+            self.account_id,
+            body
         )
 
-        try:
-            r = requests.post(
-                self._notification_url,
-                data=body,
-                headers={
-                    'X-H51-Timestamp': timestamp,
-                    'X-H51-Signature': signature.hexdigest()
-                }
-            )
-
-        except requests.exceptions.HTTPError:
-            # Ignore failures to call the notification URL
-            pass
-
     def to_json_type(self):
         data = super().to_json_type()
         data['account_id'] = str(self.account_id)
         data['asset_id'] = str(self.asset_id)
         data['notification_url'] = self._notification_url
+        data['job_id'] = self._job_id
         return data
 
     @classmethod
@@ -118,6 +131,7 @@ class AssetTask(tasks.BaseTask):
         data['account_id'] = ObjectId(data['account_id'])
         data['asset_id'] = ObjectId(data['asset_id'])
         data['notification_url'] = data['notification_url']
+        data['job_id'] = data.get('job_id')
         return super().from_json_type(data)
 
     @classmethod
@@ -130,8 +144,15 @@ class AnalyzeTask(AssetTask):
     A task to analyze an asset.
     """
 
-    def __init__(self, account_id, asset_id, analyzers, notification_url=None):
-        super().__init__(account_id, asset_id, notification_url)
+    def __init__(
+        self,
+        account_id,
+        asset_id,
+        analyzers,
+        notification_url=None,
+        job_id=None
+    ):
+        super().__init__(account_id, asset_id, notification_url, job_id)
 
         # A list of analyzers `[(analyzer_name, init_args), ...]` that the task
         # must run against the asset.
@@ -162,9 +183,10 @@ class GenerateVariationTask(AssetTask):
         asset_id,
         variation_name,
         transforms,
-        notification_url=None
+        notification_url=None,
+        job_id=None
     ):
-        super().__init__(account_id, asset_id, notification_url)
+        super().__init__(account_id, asset_id, notification_url, job_id)
 
         # The name of the variation to be generated
         self._variation_name = variation_name
@@ -172,6 +194,25 @@ class GenerateVariationTask(AssetTask):
         # The transforms to perform to generate the variation
         self._transforms = transforms
 
+    @property
+    def flight_key(self):
+        """
+        Return a key that identifies the variation this task will generate
+        (the asset, variation name and transforms), the key is used to prevent
+        identical tasks being in flight at the same time.
+        """
+
+        transforms_hash = hashlib.sha1(
+            json.dumps(self._transforms, sort_keys=True).encode('utf8')
+        )
+
+        return ':'.join([
+            'h51_generate_variation_flight',
+            str(self.asset_id),
+            self.variation_name,
+            transforms_hash.hexdigest()
+        ])
+
     @property
     def variation_name(self):
         return self._variation_name
@@ -180,6 +221,15 @@ class GenerateVariationTask(AssetTask):
         for name, settings in self._transforms:
             yield get_transform(asset.type, name)(**settings)
 
+    def release_flight(self, conn):
+        """
+        Release the task's flight (see `flight_key`) if the task holds it,
+        return True if the flight was released.
+        """
+        return bool(
+            conn.eval(RELEASE_FLIGHT_SCRIPT, 1, self.flight_key, self.id)
+        )
+
     def to_json_type(self):
         data = super().to_json_type()
         data['variation_name'] = self._variation_name
@@ -0,0 +1,68 @@
+"""
+Execution traces record the time and resources used by each step (e.g
+fetching the file, each transform or analyzer) of performing a task.
+"""
+
+import contextlib
+import resource
+import time
+
+__all__ = ['Trace']
+
+
+class Trace:
+    """
+    A trace of the steps taken to perform a task. For each step we record:
+
+    - `phase`: the type of step (e.g `fetch_file`, `transform`, `analyze`),
+    - `name`: the name of the step (e.g the transform's name),
+    - `wall_time`: the elapsed time (in seconds),
+    - `cpu_time`: the CPU time used by the process (in seconds),
+    - `bytes_in`, `bytes_out`: the length of the data consumed and produced
+      by the step (where known),
+    - `frames`: the number of frames (images only, where known),
+    - `peak_rss`: the peak resident set size (in bytes) of the process at
+      the end of the step.
+    """
+
+    def __init__(self):
+
+        # The steps recorded
+        self._steps = []
+
+    @contextlib.contextmanager
+    def step(self, phase, name=''):
+        """
+        Record a step, the step (a dictionary) is yielded so that the data
+        consumed and produced by the step can be recorded against it.
+        """
+
+        step = {
+            'phase': phase,
+            'name': name,
+            'wall_time': None,
+            'cpu_time': None,
+            'bytes_in': None,
+            'bytes_out': None,
+            'frames': None,
+            'peak_rss': None
+        }
+
+        wall_started = time.perf_counter()
+        cpu_started = time.process_time()
+        try:
+            yield step
+
+        finally:
+            step['wall_time'] = round(time.perf_counter() - wall_started, 6)
+            step['cpu_time'] = round(time.process_time() - cpu_started, 6)
+
+            # `ru_maxrss` is reported in kilobytes (on Linux)
+            step['peak_rss'] = resource.getrusage(
+                resource.RUSAGE_SELF
+            ).ru_maxrss * 1024
+
+            self._steps.append(step)
+
+    def to_json_type(self):
+        return list(self._steps)
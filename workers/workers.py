@@ -1,24 +1,38 @@
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import json
 import logging
 import os
 import random
+import resource
 import traceback
 import socket
+import sys
+import time
 
+from bson.objectid import ObjectId
 from flask import Config
 import mongoframes
+from mongoframes import In, Q
 import pymongo
 import redis
 import redis.sentinel
 import sentry_sdk
 from sentry_sdk.integrations.logging import LoggingIntegration
 from sentry_sdk.integrations.redis import RedisIntegration
+from swm.population.spawners.local import LocalSpawner
 from swm.workers import BaseWorker
 
-from blueprints.accounts.models import Account
-from blueprints.assets.models import Variation
+from blueprints.assets.models import Asset, Variation
+import metrics
+import profiler
 
+from . import counters
+from .jobs import complete_job_task
+from .notifications import enqueue_notification
+from .population import QueueDepthControl
 from .tasks import AnalyzeTask, GenerateVariationTask
+from .trace import Trace
 
 __all__ = ['AssetWorker']
 
@@ -28,7 +42,7 @@ class AssetWorker(BaseWorker):
     A worker for performing asset tasks (running analyzers and filters).
     """
 
-    def __init__(self, env, idle_lifespan):
+    def __init__(self, env, idle_lifespan, population_spawner=None):
 
         # Load settings
         self.config = Config(os.path.dirname(os.path.realpath(__file__)))
@@ -55,6 +69,28 @@ class AssetWorker(BaseWorker):
                 ]
             )
 
+        # The pending tasks (in the order the worker will attempt them) as of
+        # the last call to `get_tasks`.
+        self._pending_tasks = []
+
+        # A table of files being fetched in the background for pending tasks
+        # `{task_id: Future}`.
+        self._prefetched_files = OrderedDict()
+
+        # The thread pool used to prefetch files
+        self._prefetch_executor = None
+        if self.config.get('ASSET_WORKER_PREFETCH_DEPTH'):
+            self._prefetch_executor = ThreadPoolExecutor(
+                max_workers=self.config['ASSET_WORKER_PREFETCH_DEPTH'],
+                thread_name_prefix='h51_prefetch'
+            )
+
+        # Memory guard
+        if self.config.get('ASSET_WORKER_MAX_ADDRESS_SPACE'):
+            self.set_address_space_limit(
+                self.config['ASSET_WORKER_MAX_ADDRESS_SPACE']
+            )
+
         # Mongo database
         self.mongo = pymongo.MongoClient(self.config.get('MONGO_URI'))
         self.db = self.mongo.get_default_database()
@@ -85,6 +121,33 @@ class AssetWorker(BaseWorker):
                 decode_responses=True
             )
 
+        # Population control
+        population_control = self.config['ASSET_WORKER_POPULATION_CONTROL']
+        population_spawner = population_spawner \
+                or self.config['ASSET_WORKER_POPULATION_SPAWNER']
+
+        autoscale = self.config.get('ASSET_WORKER_AUTOSCALE')
+        if autoscale and not population_control:
+            population_control = QueueDepthControl(**autoscale)
+
+            if not population_spawner:
+
+                # Spawn workers on this node (workers that are spawned retire
+                # once idle for the spawned idle lifespan).
+                population_spawner = LocalSpawner([
+                    sys.executable,
+                    os.path.join(
+                        os.path.dirname(os.path.dirname(
+                            os.path.realpath(__file__)
+                        )),
+                        'asset_worker.py'
+                    ),
+                    '--env',
+                    env,
+                    '--idle-lifespan',
+                    str(self.config['ASSET_WORKER_SPAWNED_IDLE_LIFESPAN'])
+                ])
+
         super().__init__(
             conn,
             [AnalyzeTask, GenerateVariationTask],
@@ -93,10 +156,23 @@ class AssetWorker(BaseWorker):
             max_spawn_time=self.config['ASSET_WORKER_MAX_SPAWN_TIME'],
             sleep_interval=self.config['ASSET_WORKER_SLEEP_INTERVAL'],
             idle_lifespan=idle_lifespan,
-            population_control=self.config['ASSET_WORKER_POPULATION_CONTROL'],
-            population_spawner=self.config['ASSET_WORKER_POPULATION_SPAWNER']
+            population_control=population_control,
+            population_spawner=population_spawner
         )
 
+        # Profiler
+        self.profiler = profiler.SamplingProfiler(
+            self.config['PROFILE_PATH'],
+            self.id,
+            self.config['PROFILE_INTERVAL']
+        )
+
+        # The Id of the last profiler control message acted on
+        self._profile_message_id = None
+
+        if self.config['PROFILE_PATH'] and self.config['PROFILE']:
+            self.profiler.start(self.config['PROFILE_WINDOW'], repeat=True)
+
     def analyze(self, task):
         """Analyze an asset"""
         asset = task.get_asset(
@@ -105,35 +181,86 @@ class AssetWorker(BaseWorker):
             }
         )
 
-        file = task.get_file()
+        trace = Trace()
+
+        with trace.step('fetch_file') as step:
+            file = self.get_file(task)
+            step['bytes_out'] = len(file)
 
         history = []
         for analyzer in task.get_analyzers(asset):
-            analyzer.analyze(self.config, asset, file, history)
+            with metrics.TASK_PHASE_SECONDS.time(
+                phase='analyze',
+                name=analyzer.name
+            ), trace.step('analyze', analyzer.name) as step, \
+                    self.profiler.tag(analyzer=analyzer.name):
+                step['bytes_in'] = len(file)
+                analyzer.analyze(self.config, asset, file, history)
+
             history.append(analyzer)
 
         if task.notification_url:
 
-            # POST the result to the notification URL
-            account = Account.by_id(
-                asset.account,
-                projection={'api_key': True}
-            )
+            # Queue the result to be POSTed to the notification URL
+            with metrics.TASK_PHASE_SECONDS.time(phase='notify', name=''), \
+                    trace.step('notify'):
+                task.post_notification(
+                    self._conn,
+                    json.dumps(asset.to_json_type())
+                )
 
-            task.post_notification(
-                account.api_key,
-                json.dumps(asset.to_json_type())
-            )
+        return {'trace': trace.to_json_type()}
+
+    def update_job(self, task, error=None):
+        """
+        Record that a task belonging to a bulk job is complete, if it's the
+        last of the job's tasks then notify the job's notification URL.
+        """
+
+        name = str(task.asset_id)
+        if isinstance(task, GenerateVariationTask):
+            name = f'{name}:{task.variation_name}'
 
-        return {}
+        job = complete_job_task(self._conn, task.job_id, name, error)
+        if job:
+            with metrics.TASK_PHASE_SECONDS.time(phase='notify', name='job'):
+                self.notify_job(task.job_id, job)
 
     def do_task(self, task):
 
-        if isinstance(task, AnalyzeTask):
-            return self.analyze(task)
+        counters.start_task(self._conn, task, self.id)
+        counters.update_worker(
+            self._conn,
+            self.id,
+            self.config['ASSET_WORKER_MAX_STATUS_INTERVAL']
+        )
+
+        started = time.perf_counter()
+        error = None
+        try:
+            with self.profiler.tag(task=task.get_id_prefix()):
+                if isinstance(task, AnalyzeTask):
+                    return self.analyze(task)
+
+                elif isinstance(task, GenerateVariationTask):
+                    return self.generate_variation(task)
 
-        elif isinstance(task, GenerateVariationTask):
-            return self.generate_variation(task)
+        except Exception as e:
+            error = e
+            raise
+
+        finally:
+            counters.complete_task(self._conn, task, failed=bool(error))
+
+            if task.job_id:
+                self.update_job(task, error)
+
+            metrics.TASK_SECONDS.observe(
+                time.perf_counter() - started,
+                task=task.get_id_prefix(),
+                result='error' if error else 'complete'
+            )
+            self.write_metrics()
 
     def generate_variation(self, task):
         """Generate variation for the asset"""
@@ -146,38 +273,121 @@ class AssetWorker(BaseWorker):
             }
         )
 
-        file = task.get_file()
-        native_file = None
-
-        history = []
-        for transform in task.get_transforms(asset):
-            native_file = transform.transform(
-                self.config,
-                asset,
-                file,
-                task.variation_name,
-                native_file,
-                history
+        trace = Trace()
+
+        try:
+            with trace.step('fetch_file') as step:
+                file = self.get_file(task)
+                step['bytes_out'] = len(file)
+
+            native_file = None
+
+            history = []
+            for transform in task.get_transforms(asset):
+                with metrics.TASK_PHASE_SECONDS.time(
+                    phase='transform',
+                    name=transform.name
+                ), trace.step('transform', transform.name) as step, \
+                        self.profiler.tag(transform=transform.name):
+
+                    # Transforms either read the source file (the first
+                    # transform) or the native file produced by the previous
+                    # transform.
+                    if native_file is None:
+                        step['bytes_in'] = len(file)
+
+                    native_file = transform.transform(
+                        self.config,
+                        asset,
+                        file,
+                        task.variation_name,
+                        native_file,
+                        history
+                    )
+
+                    step['frames'] = self._count_frames(native_file)
+
+                    if transform.final:
+                        variation = asset.variations.get(task.variation_name)
+                        if variation:
+                            step['bytes_out'] = variation.meta.get('length')
+
+                history.append(transform)
+
+        finally:
+
+            # Release the task's flight key (before the task's complete or
+            # error event is broadcast) so identical requests made from now
+            # on add a new task.
+            task.release_flight(self._conn)
+
+        if self.config.get('ASSET_WORKER_STORE_TRACE'):
+
+            # Store the trace against the variation
+            Asset.get_collection().update_one(
+                {'_id': asset._id},
+                {
+                    '$set': {
+                        f'variations.{task.variation_name}.trace': \
+                                trace.to_json_type()
+                    }
+                }
             )
-            history.append(transform)
 
         if task.notification_url:
 
-            # POST the result to the notification URL
-            account = Account.by_id(
-                asset.account,
-                projection={'api_key': True}
-            )
+            # Queue the result to be POSTed to the notification URL
+            with metrics.TASK_PHASE_SECONDS.time(phase='notify', name=''), \
+                    trace.step('notify'):
+                task.post_notification(
+                    self._conn,
+                    json.dumps(asset.to_json_type())
+                )
 
-            task.post_notification(
-                account.api_key,
-                json.dumps(asset.to_json_type())
-            )
+        return {'trace': trace.to_json_type()}
+
+    def get_file(self, task):
+        """
+        Get the file for the asset the task will be run against, using the
+        prefetched file if there is one, and start prefetching the files for
+        the tasks the worker is likely to attempt next.
+        """
+
+        prefetched_file = self._prefetched_files.pop(task.id, None)
+
+        self.prefetch_files(task)
+
+        with metrics.TASK_PHASE_SECONDS.time(phase='fetch_file', name=''):
+            if prefetched_file:
+                try:
+                    return prefetched_file.result()
 
-        return {}
+                except Exception:
+                    # Errors prefetching are reported by fetching the file
+                    # again.
+                    pass
+
+            return task.get_file()
+
+    def get_metrics_path(self):
+        """Return the path of the worker's metrics file"""
+        return os.path.join(
+            self.config['ASSET_WORKER_METRICS_PATH'],
+            f'{self.id.replace(":", "_")}.prom'
+        )
 
     def get_tasks(self):
 
+        # `get_tasks` is called on every iteration of the worker's loop so we
+        # use it to keep the worker's entry in the counters current.
+        counters.update_worker(
+            self._conn,
+            self.id,
+            self.config['ASSET_WORKER_MAX_STATUS_INTERVAL']
+        )
+
+        self.update_profiler()
+
         tasks = super().get_tasks()
         pairs = list(tasks.items())
 
@@ -186,8 +396,73 @@ class AssetWorker(BaseWorker):
 
         tasks = dict(pairs)
 
+        # Record the pending tasks (in the order they'll be attempted) and
+        # discard prefetched files for tasks that are no longer pending.
+        self._pending_tasks = [t for t in tasks.values() if not t.assigned_to]
+
+        pending_task_ids = {t.id for t in self._pending_tasks}
+        for task_id in list(self._prefetched_files.keys()):
+            if task_id not in pending_task_ids:
+                self._prefetched_files.pop(task_id).cancel()
+
         return tasks
 
+    def notify_job(self, job_id, job):
+        """
+        Queue a single notification containing the results of all the tasks
+        in a (complete) bulk job to be POSTed to the job's notification URL.
+        """
+
+        projection = {
+            'uid': True,
+            'expires': True,
+            'ext': True,
+            'meta': True,
+            'name': True
+        }
+        result_field = 'meta'
+
+        if job['type'] == 'transform':
+            projection['variations'] = {'$sub.': Variation}
+            result_field = 'variations'
+
+        assets = Asset.many(
+            In(Q._id, [ObjectId(i) for i in job['asset_ids']]),
+            projection=projection
+        )
+
+        results = [a.to_json_type() for a in assets]
+
+        # Errors are recorded against the asset Id (and variation name), for
+        # the notification they are reported against the asset's uid.
+        uids = {str(a._id): a.uid for a in assets}
+
+        errors = {}
+        for name, reason in job['errors'].items():
+            asset_id, _, variation_name = name.partition(':')
+            name = uids.get(asset_id, asset_id)
+            if variation_name:
+                name = f'{name}:{variation_name}'
+
+            errors[name] = [reason]
+
+        enqueue_notification(
+            self._conn,
+            job['notification_url'],
+            job['account_id'],
+            json.dumps({
+                'job_id': job_id,
+                'results': [
+                    {
+                        'uid': r['uid'],
+                        result_field: r[result_field]
+                    }
+                    for r in results
+                ],
+                'errors': errors
+            })
+        )
+
     def on_error(self, task_id, error):
         super().on_error(task_id, error)
 
@@ -208,6 +483,106 @@ class AssetWorker(BaseWorker):
             if self.config.get('SENTRY_DSN'):
                 sentry_sdk.capture_exception(error)
 
+    def prefetch_files(self, task):
+        """
+        Start fetching (in the background) the files for the pending tasks
+        that follow the given task, up to the prefetch depth.
+
+        Pending tasks may be claimed by another worker, in which case the
+        prefetched file is discarded.
+        """
+
+        if not self._prefetch_executor:
+            return
+
+        depth = self.config['ASSET_WORKER_PREFETCH_DEPTH']
+        task_ids = [t.id for t in self._pending_tasks]
+
+        if task.id not in task_ids:
+            return
+
+        start = task_ids.index(task.id) + 1
+        for next_task in self._pending_tasks[start:start + depth]:
+
+            if len(self._prefetched_files) >= depth:
+                break
+
+            if next_task.id not in self._prefetched_files:
+                self._prefetched_files[next_task.id] = \
+                        self._prefetch_executor.submit(next_task.get_file)
+
+    def shut_down(self, *args):
+        counters.remove_worker(self._conn, self.id)
+        self.profiler.stop()
+
+        # Remove the worker's metrics file
+        if self.config.get('ASSET_WORKER_METRICS_PATH'):
+            try:
+                os.remove(self.get_metrics_path())
+            except FileNotFoundError:
+                pass
+
+        super().shut_down(*args)
+
+    def set_address_space_limit(self, limit):
+        """
+        Limit the address space of the worker process (`RLIMIT_AS`) so that
+        tasks which exceed the limit raise a `MemoryError` (and fail) instead
+        of the worker being killed by the OS, along with any tasks it has
+        claimed. The limit applies to all of the process's virtual memory,
+        not just the memory used by tasks.
+        """
+        soft, hard = resource.getrlimit(resource.RLIMIT_AS)
+
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+
+        resource.setrlimit(resource.RLIMIT_AS, (limit, hard))
+
+    def update_profiler(self):
+        """
+        Start profiling if a control message requesting the worker profiles
+        has been sent (see `profiler.send_control_message`).
+        """
+
+        if not self.config['PROFILE_PATH']:
+            return
+
+        message = profiler.get_control_message(self._conn, self.id)
+        if message and message['id'] != self._profile_message_id:
+            self._profile_message_id = message['id']
+            self.profiler.start(message['window'])
+
+    def write_metrics(self):
+        """
+        Write the worker's metrics to a file (if a metrics path is set) for
+        collection, e.g by node exporter's textfile collector.
+        """
+
+        if not self.config.get('ASSET_WORKER_METRICS_PATH'):
+            return
+
+        try:
+            metrics.write_to_file(
+                self.get_metrics_path(),
+                labels={'worker': self.id}
+            )
+
+        except OSError as error:
+            if self.config.get('SENTRY_DSN'):
+                sentry_sdk.capture_exception(error)
+
     @classmethod
     def get_id_prefix(cls):
         return 'h51_asset_worker'
+
+    @staticmethod
+    def _count_frames(native_file):
+        """
+        Return the number of frames in a native file (or `None` if the native
+        file isn't a sequence of frames).
+        """
+        try:
+            return len(native_file)
+        except TypeError:
+            return None